@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Asset memory benchmark - Memory and parse time of large album pools
+
+Builds a synthetic /api/albums/{id} response with N assets and measures how
+much memory the parsed Asset list takes, compared with a plain (non-slotted)
+dataclass, and how long decoding and parsing take with json and orjson, and
+with the streaming decoder that keeps only photos as they arrive, whole or
+in pages the way the album index consumes them.
+
+Usage: python3 benchmarks/asset_memory.py [--assets 100000]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rootfs', 'usr', 'bin'))
+
+import immich_api_client
+from immich_api_client import is_photo, iter_photo_pages, parse_asset
+from json_stream import CHUNK_SIZE, iter_array
+
+@dataclass
+class PlainAsset:
+    """The asset model as it was before slots, for comparison"""
+    id: str
+    type: str
+    original_filename: str
+    file_created_at: Optional[str] = None
+    file_modified_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    is_favorite: bool = False
+    is_archived: bool = False
+    duration: Optional[str] = None
+    author: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    country: Optional[str] = None
+
+def parse_plain_asset(asset_data):
+    return PlainAsset(
+        id=asset_data.get('id', ''),
+        type=asset_data.get('type', ''),
+        original_filename=asset_data.get('originalFileName', ''),
+        file_created_at=asset_data.get('fileCreatedAt'),
+        file_modified_at=asset_data.get('fileModifiedAt'),
+        updated_at=asset_data.get('updatedAt'),
+        is_favorite=asset_data.get('isFavorite', False),
+        is_archived=asset_data.get('isArchived', False),
+        duration=asset_data.get('duration')
+    )
+
+def make_album_payload(count):
+    """Synthetic album response shaped like Immich's"""
+    assets = []
+    for i in range(count):
+        assets.append({
+            'id': f"{i:08x}-0000-4000-8000-{i:012x}",
+            'type': 'IMAGE' if i % 10 else 'VIDEO',
+            'originalFileName': f"IMG_{i:06d}.jpg",
+            'fileCreatedAt': '2023-07-14T10:21:33.000Z',
+            'fileModifiedAt': '2023-07-14T10:21:33.000Z',
+            'updatedAt': '2024-02-01T08:00:00.000Z',
+            'isFavorite': i % 50 == 0,
+            'isArchived': False,
+            'duration': '0:00:00.00000',
+            'thumbhash': '1QcSHQRnh493V4dIh4eXh1h4kJUI',
+            'ownerId': '6e1f0c5a-0000-4000-8000-000000000001',
+            'checksum': 'yXJ8mL0n0GQXH0r2f8bLq0Hc9kE='
+        })
+    return json.dumps({'id': 'album', 'albumName': 'Benchmark', 'assets': assets}).encode('utf-8')
+
+def measure(label, build):
+    """Run build() and report its time and the memory still held by its result"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<38} {elapsed * 1000:8.1f} ms  held {current / 1048576:7.1f} MiB  peak {peak / 1048576:7.1f} MiB")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--assets', type=int, default=100000, help='number of assets in the album')
+    args = parser.parse_args()
+
+    payload = make_album_payload(args.assets)
+    print(f"{args.assets} assets, response body {len(payload) / 1048576:.1f} MiB, "
+          f"orjson {'available' if immich_api_client.orjson is not None else 'not installed'}")
+
+    measure('json.loads', lambda: json.loads(payload))
+    if immich_api_client.orjson is not None:
+        measure('orjson.loads', lambda: immich_api_client.orjson.loads(payload))
+
+    data = json.loads(payload)['assets']
+    plain = measure('parse -> plain dataclass', lambda: [parse_plain_asset(item) for item in data])
+    slotted = measure('parse -> slotted Asset (parse_asset)', lambda: [parse_asset(item) for item in data])
+    del data, plain, slotted
+
+    measure('decode + parse_asset (end to end)',
+            lambda: [parse_asset(item) for item in immich_api_client.json_loads(payload)['assets']])
+
+    chunks = [payload[i:i + CHUNK_SIZE] for i in range(0, len(payload), CHUNK_SIZE)]
+    measure('streamed photos (end to end)',
+            lambda: [parse_asset(item) for item in iter_array(chunks, 'assets') if is_photo(item)])
+    measure('streamed pages (album index)',
+            lambda: sum(len(page) for page in iter_photo_pages(iter_array(chunks, 'assets'))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Fake Immich - Minimal local stand-in for the Immich API
+
+Serves synthetic albums, memories, asset details and images for the endpoints
+the kiosk uses, so the addon can be run and measured without a real server.
+Search endpoints (/api/search/random, /api/search/metadata) are served too,
+unless --legacy is given, in which case they answer 404 like older servers.
+
+Every request is counted per endpoint; GET /_stats returns the counters.
+
+Usage: python3 benchmarks/fake_immich.py [--port 2283] [--albums 2] [--album-size 500]
+                                         [--latency 0.01] [--latency-jitter 0]
+                                         [--image-size 2400x1600] [--asset-padding 0] [--legacy]
+"""
+
+import io
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+USERS = [
+    {'id': 'user-1', 'name': 'Jana', 'email': 'jana@example.com'},
+    {'id': 'user-2', 'name': 'Peter', 'email': 'peter@example.com'}
+]
+CITIES = [('Bratislava', 'Bratislavsky kraj', 'Slovakia'), ('Kosice', 'Kosicky kraj', 'Slovakia'), ('Vienna', 'Vienna', 'Austria')]
+
+def make_image(width: int, height: int, seed: int) -> bytes:
+    """Encode a JPEG of the given size, or return JPEG-looking filler without Pillow"""
+    if Image is None:
+        return b'\xff\xd8\xff\xe0' + bytes(width * height // 20) + b'\xff\xd9'
+    color = ((seed * 37) % 256, (seed * 91) % 256, (seed * 53) % 256)
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+class FakeImmich:
+    """Synthetic library shared by all request handlers"""
+
+    def __init__(self, albums: int = 2, album_size: int = 500, latency: float = 0.01, legacy: bool = False,
+                 image_size=(2400, 1600), latency_jitter: float = 0.0, asset_padding: int = 0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.legacy = legacy
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+        self.assets = {}
+        self.albums = []
+        # Pads every asset's originalPath, to simulate heavier album payloads
+        padding = 'x' * asset_padding
+        for album_number in range(albums):
+            album_id = f"album-{album_number}"
+            asset_ids = []
+            for index in range(album_size):
+                number = album_number * album_size + index
+                asset_id = f"asset-{number:06d}"
+                city, state, country = CITIES[number % len(CITIES)]
+                self.assets[asset_id] = {
+                    'id': asset_id,
+                    'type': 'VIDEO' if number % 25 == 0 else 'IMAGE',
+                    'originalFileName': f"IMG_{number:06d}.jpg",
+                    'originalPath': f"/usr/src/app/upload/library/admin/IMG_{number:06d}{padding}.jpg",
+                    'fileCreatedAt': f"20{10 + number % 15}-0{1 + number % 9}-1{number % 10}T10:00:00.000Z",
+                    'fileModifiedAt': '2024-01-01T00:00:00.000Z',
+                    'updatedAt': '2024-01-01T00:00:00.000Z',
+                    'isFavorite': number % 7 == 0,
+                    'isArchived': number % 50 == 1,
+                    'duration': '0:00:00.00000',
+                    'ownerId': USERS[number % len(USERS)]['id'],
+                    'thumbhash': '1QcSHQRnh493V4dIh4eXh1h4kJUI',
+                    '_exif': {'city': city, 'state': state, 'country': country}
+                }
+                asset_ids.append(asset_id)
+            self.albums.append({
+                'id': album_id,
+                'albumName': f"Album {album_number}",
+                'description': '',
+                'assetCount': album_size,
+                'createdAt': '2024-01-01T00:00:00.000Z',
+                'updatedAt': '2024-01-01T00:00:00.000Z',
+                'assetIds': asset_ids
+            })
+
+        width, height = image_size
+        self.images = {
+            'thumbnail': make_image(250, 250 * height // width, 1),
+            'preview': make_image(1440, 1440 * height // width, 2),
+            'fullsize': make_image(width, height, 3),
+            'original': make_image(width, height, 4)
+        }
+
+    def delay(self):
+        """Sleep for the configured upstream latency"""
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def count(self, endpoint: str):
+        with self._lock:
+            self.counters[endpoint] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def asset(self, asset_id: str, with_exif: bool = False):
+        data = self.assets.get(asset_id)
+        if data is None:
+            return None
+        result = {key: value for key, value in data.items() if not key.startswith('_')}
+        if with_exif:
+            owner = next(user for user in USERS if user['id'] == data['ownerId'])
+            result['owner'] = dict(owner)
+            result['exifInfo'] = dict(data['_exif'])
+        return result
+
+    def album(self, album_id: str):
+        return next((album for album in self.albums if album['id'] == album_id), None)
+
+    def search_pool(self, body):
+        """Assets matching a search body; several albumIds mean "in all of them", like Immich"""
+        album_ids = body.get('albumIds') or []
+        if album_ids:
+            sets = [set(self.album(album_id)['assetIds']) if self.album(album_id) else set() for album_id in album_ids]
+            pool = sorted(set.intersection(*sets))
+        else:
+            pool = sorted(self.assets)
+        if body.get('type'):
+            pool = [asset_id for asset_id in pool if self.assets[asset_id]['type'] == body['type']]
+        return pool
+
+class FakeImmichHandler(BaseHTTPRequestHandler):
+    """Request handler serving the FakeImmich of its server"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self) -> FakeImmich:
+        return self.server.fake
+
+    def send_body(self, body, status=200, content_type='application/json', headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def not_found(self):
+        self.send_body({'message': 'Not Found', 'statusCode': 404}, status=404)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def send_image(self, variant: str):
+        body = self.fake.images[variant]
+        range_header = self.headers.get('Range')
+        match = re.match(r'bytes=(\d*)-(\d*)$', range_header or '')
+        if variant != 'original' or not match:
+            return self.send_body(body, content_type='image/jpeg', headers={'Accept-Ranges': 'bytes'})
+        start = int(match.group(1) or 0)
+        end = min(int(match.group(2)) if match.group(2) else len(body) - 1, len(body) - 1)
+        self.send_body(body[start:end + 1], status=206, content_type='image/jpeg', headers={
+            'Accept-Ranges': 'bytes',
+            'Content-Range': f"bytes {start}-{end}/{len(body)}"
+        })
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        query = parse_qs(url.query)
+        if path == '/_stats':
+            return self.send_body(self.fake.stats())
+
+        self.fake.delay()
+        parts = path.strip('/').split('/')
+        if path == '/api/users/me':
+            self.fake.count('users/me')
+            return self.send_body(USERS[0])
+        if path == '/api/users':
+            self.fake.count('users')
+            return self.send_body(USERS)
+        if path == '/api/albums':
+            self.fake.count('albums')
+            return self.send_body([
+                {key: value for key, value in album.items() if key != 'assetIds'}
+                for album in self.fake.albums
+            ])
+        if len(parts) == 3 and parts[:2] == ['api', 'albums']:
+            self.fake.count('albums/{id}')
+            album = self.fake.album(parts[2])
+            if album is None:
+                return self.not_found()
+            result = {key: value for key, value in album.items() if key != 'assetIds'}
+            result['assets'] = [self.fake.asset(asset_id) for asset_id in album['assetIds']]
+            return self.send_body(result)
+        if path == '/api/memories':
+            self.fake.count('memories')
+            asset_ids = sorted(self.fake.assets)
+            now = time.gmtime()
+            memories = []
+            for year in range(1, 4):
+                chosen = asset_ids[year * 10:year * 10 + 8]
+                memories.append({
+                    'id': f"memory-{year}",
+                    'type': 'on_this_day',
+                    'showAt': time.strftime('%Y-%m-%dT00:00:00.000Z', now),
+                    'hideAt': time.strftime('%Y-%m-%dT23:59:59.999Z', now),
+                    'data': {'year': now.tm_year - year},
+                    'assets': [self.fake.asset(asset_id, with_exif=True) for asset_id in chosen]
+                })
+            return self.send_body(memories)
+        if len(parts) >= 3 and parts[:2] == ['api', 'assets'] and parts[2] in self.fake.assets:
+            if len(parts) == 3:
+                self.fake.count('assets/{id}')
+                return self.send_body(self.fake.asset(parts[2], with_exif=True))
+            if parts[3:] == ['thumbnail']:
+                size = query.get('size', ['thumbnail'])[0]
+                self.fake.count(f"assets/{{id}}/thumbnail?size={size}")
+                if size not in ('thumbnail', 'preview', 'fullsize'):
+                    return self.send_body({'message': 'Invalid size', 'statusCode': 400}, status=400)
+                return self.send_image(size)
+            if parts[3:] == ['original']:
+                self.fake.count('assets/{id}/original')
+                return self.send_image('original')
+        self.fake.count('not found')
+        self.not_found()
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        self.fake.delay()
+        if path in ('/api/search/random', '/api/search/metadata') and not self.fake.legacy:
+            body = self.read_json()
+            pool = self.fake.search_pool(body)
+            size = int(body.get('size') or 250)
+            with_exif = bool(body.get('withExif'))
+            if path == '/api/search/random':
+                self.fake.count('search/random')
+                chosen = random.sample(pool, min(size, len(pool)))
+                return self.send_body([self.fake.asset(asset_id, with_exif) for asset_id in chosen])
+
+            self.fake.count('search/metadata')
+            page = int(body.get('page') or 1)
+            chosen = pool[(page - 1) * size:page * size]
+            next_page = str(page + 1) if page * size < len(pool) else None
+            return self.send_body({
+                'albums': {'total': 0, 'count': 0, 'items': [], 'facets': []},
+                'assets': {
+                    'total': len(chosen),
+                    'count': len(chosen),
+                    'items': [self.fake.asset(asset_id, with_exif) for asset_id in chosen],
+                    'facets': [],
+                    'nextPage': next_page
+                }
+            })
+        self.fake.count('not found')
+        self.read_json()
+        self.not_found()
+
+def make_server(host: str = '127.0.0.1', port: int = 2283, **options) -> ThreadingHTTPServer:
+    """Create (but do not start) a fake Immich server"""
+    server = ThreadingHTTPServer((host, port), FakeImmichHandler)
+    server.daemon_threads = True
+    server.fake = FakeImmich(**options)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake Immich server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2283)
+    parser.add_argument('--albums', type=int, default=2, help='number of albums')
+    parser.add_argument('--album-size', type=int, default=500, help='assets per album')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds added to every response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='random extra latency, up to this many seconds')
+    parser.add_argument('--asset-padding', type=int, default=0, help='extra bytes in every asset of album responses')
+    parser.add_argument('--image-size', default='2400x1600', help='size of fullsize and original images')
+    parser.add_argument('--legacy', action='store_true', help='answer search endpoints with 404, like older servers')
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.image_size.lower().split('x'))
+    server = make_server(args.host, args.port, albums=args.albums, album_size=args.album_size,
+                         latency=args.latency, legacy=args.legacy, image_size=(width, height),
+                         latency_jitter=args.latency_jitter, asset_padding=args.asset_padding)
+    print(f"Fake Immich with {len(server.fake.assets)} assets listening on http://{args.host}:{args.port}"
+          f"{' (legacy, no search API)' if args.legacy else ''}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
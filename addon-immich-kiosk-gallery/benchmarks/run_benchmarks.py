@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Kiosk benchmarks - Load scenarios against the addon backed by a fake Immich
+
+Starts benchmarks/fake_immich.py in-process, runs the addon as a subprocess
+against it with a temporary data directory, and drives these scenarios:
+
+  random-photos   concurrent GET /api/randomPhotos
+  memories        concurrent GET /api/memories
+  proxy-cold      thumbnail + full image of every photo once (empty image cache)
+  proxy-warm      the same images again, repeated (served from the cache)
+
+For each scenario it reports p50/p95/p99 latency, throughput, errors, the
+upstream requests it caused and the addon's peak RSS. With --json the results
+are also written to a file, tagged with the addon version, so runs can be
+compared across version bumps.
+
+Usage: python3 benchmarks/run_benchmarks.py [--albums 2] [--album-size 1000] [--latency 0.02]
+                                            [--requests 200] [--concurrency 8] [--json results.json]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import shutil
+import tempfile
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.join(BENCHMARKS_DIR, '..')
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_immich import make_server
+
+SCENARIOS = ['random-photos', 'memories', 'proxy-cold', 'proxy-warm']
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def addon_version() -> str:
+    with open(os.path.join(ADDON_DIR, 'config.yaml')) as f:
+        match = re.search(r'^version:\s*(\S+)', f.read(), re.MULTILINE)
+    return match.group(1) if match else 'unknown'
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+class RssSampler:
+    """Samples the resident set size of a process from /proc while a scenario runs"""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def read_status(self, field: str) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith(field + ':'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.peak_kb = max(self.peak_kb, self.read_status('VmRSS') or 0)
+            self._stopped.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+class Kiosk:
+    """The addon running as a subprocess against the fake Immich"""
+
+    def __init__(self, immich_url: str, album_names: List[str], threads: int, extra_options: dict):
+        self.data_dir = tempfile.mkdtemp(prefix='immich-kiosk-bench-')
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        options = {
+            'immich_url': immich_url,
+            'immich_api_key': 'benchmark',
+            'immich_albums': album_names,
+            'log_level': 'warning',
+            'server_threads': threads
+        }
+        options.update(extra_options)
+        with open(os.path.join(self.data_dir, 'options.json'), 'w') as f:
+            json.dump(options, f)
+
+        env = dict(os.environ, IMMICH_KIOSK_DATA_DIR=self.data_dir, IMMICH_KIOSK_PORT=str(self.port))
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ADDON_DIR, 'rootfs', 'usr', 'bin', 'immich_kiosk.py')],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+
+    def wait_ready(self, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Kiosk exited: {self.process.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                if requests.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError('Kiosk did not become healthy in time')
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+def run_load(urls: List[str], concurrency: int) -> dict:
+    """GET every url with a pool of keep-alive clients; returns sorted latencies and counters"""
+    local = threading.local()
+
+    def fetch(url):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = session.get(url, timeout=60)
+            size = len(response.content)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            size, ok = 0, False
+        return time.perf_counter() - started, size, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(result[0] for result in results)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for result in results if not result[2]),
+        'bytes': sum(result[1] for result in results),
+        'elapsed': elapsed,
+        'latencies': latencies
+    }
+
+def run_scenario(name: str, kiosk: Kiosk, fake, build_urls: Callable[[], List[str]], concurrency: int) -> dict:
+    urls = build_urls()
+    upstream_before = fake.stats()
+    with RssSampler(kiosk.process.pid) as sampler:
+        load = run_load(urls, concurrency)
+    upstream_after = fake.stats()
+
+    latencies = load.pop('latencies')
+    return dict(
+        load,
+        scenario=name,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p95_ms=percentile(latencies, 95) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        throughput=load['requests'] / load['elapsed'] if load['elapsed'] else 0.0,
+        peak_rss_mb=sampler.peak_kb / 1024,
+        upstream_requests=sum(upstream_after.values()) - sum(upstream_before.values())
+    )
+
+def print_results(results: List[dict], hwm_kb: Optional[int]):
+    print(f"{'scenario':<15} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>8} {'MB/s':>7} {'upstream':>8} {'RSS MB':>7}")
+    for result in results:
+        print(f"{result['scenario']:<15} {result['requests']:>6} {result['errors']:>4} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['throughput']:>8.1f} {result['bytes'] / result['elapsed'] / 1e6:>7.1f} "
+              f"{result['upstream_requests']:>8} {result['peak_rss_mb']:>7.1f}")
+    if hwm_kb is not None:
+        print(f"Peak RSS of the addon over the whole run: {hwm_kb / 1024:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load scenarios for the kiosk against a fake Immich')
+    parser.add_argument('--albums', type=int, default=2)
+    parser.add_argument('--album-size', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='fake Immich latency per request, seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0.01)
+    parser.add_argument('--image-size', default='2400x1600', help='fake fullsize/original image size')
+    parser.add_argument('--asset-padding', type=int, default=0, help='extra bytes per asset in album payloads')
+    parser.add_argument('--legacy', action='store_true', help='fake Immich without the search API')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--proxy-photos', type=int, default=50, help='distinct photos in the proxy scenarios')
+    parser.add_argument('--threads', type=int, default=8, help='server_threads of the addon')
+    parser.add_argument('--option', action='append', default=[], metavar='KEY=JSON',
+                        help='extra addon option, e.g. --option resize_images=false')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.image_size.lower().split('x'))
+    fake_server = make_server('127.0.0.1', free_port(), albums=args.albums, album_size=args.album_size,
+                              latency=args.latency, latency_jitter=args.latency_jitter, legacy=args.legacy,
+                              image_size=(width, height), asset_padding=args.asset_padding)
+    threading.Thread(target=fake_server.serve_forever, daemon=True).start()
+    fake = fake_server.fake
+    immich_url = f"http://127.0.0.1:{fake_server.server_address[1]}"
+
+    extra_options = {}
+    for option in args.option:
+        key, value = option.split('=', 1)
+        extra_options[key] = json.loads(value)
+
+    album_names = [album['albumName'] for album in fake.albums]
+    kiosk = Kiosk(immich_url, album_names, args.threads, extra_options)
+    results = []
+    try:
+        kiosk.wait_ready()
+        photos = []
+
+        def proxy_urls():
+            if not photos:
+                response = requests.get(f"{kiosk.url}/api/randomPhotos", timeout=60).json()
+                photos.extend(response.get('photos', []))
+                while len(photos) < args.proxy_photos and response.get('photos'):
+                    response = requests.get(f"{kiosk.url}/api/randomPhotos", timeout=60).json()
+                    photos.extend(response.get('photos', []))
+            urls = []
+            for photo in photos[:args.proxy_photos]:
+                urls.append(kiosk.url + photo['thumbnail_url'])
+                urls.append(kiosk.url + photo['full_image_url'])
+            return urls
+
+        builders = {
+            'random-photos': lambda: [f"{kiosk.url}/api/randomPhotos"] * args.requests,
+            'memories': lambda: [f"{kiosk.url}/api/memories"] * args.requests,
+            'proxy-cold': proxy_urls,
+            'proxy-warm': lambda: (proxy_urls() * (args.requests // (2 * args.proxy_photos) + 1))[:args.requests]
+        }
+        for name in args.scenarios.split(','):
+            if name not in builders:
+                parser.error(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+            results.append(run_scenario(name, kiosk, fake, builders[name], args.concurrency))
+        hwm_kb = RssSampler(kiosk.process.pid).read_status('VmHWM')
+    finally:
+        kiosk.stop()
+        fake_server.shutdown()
+
+    print(f"Immich Kiosk Gallery {addon_version()}: {len(fake.assets)} assets, "
+          f"{args.latency * 1000:.0f} ms upstream latency, {args.concurrency} clients")
+    print_results(results, hwm_kb)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'version': addon_version(),
+                'parameters': vars(args),
+                'peak_rss_mb': hwm_kb / 1024 if hwm_kb is not None else None,
+                'scenarios': results
+            }, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Album Index - Local SQLite index of Immich album contents
+"""
+
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import List, Optional
+from immich_api_client import ImmichAPIClient, Asset, Album
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS albums (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    updated_at TEXT,
+    asset_count INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL
+);
+CREATE INDEX IF NOT EXISTS albums_name ON albums (name);
+CREATE TABLE IF NOT EXISTS assets (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    original_filename TEXT,
+    file_created_at TEXT,
+    file_modified_at TEXT,
+    updated_at TEXT,
+    is_favorite INTEGER NOT NULL DEFAULT 0,
+    is_archived INTEGER NOT NULL DEFAULT 0,
+    duration TEXT,
+    thumbhash TEXT
+);
+CREATE TABLE IF NOT EXISTS album_assets (
+    album_id TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    PRIMARY KEY (album_id, asset_id)
+);
+CREATE INDEX IF NOT EXISTS album_assets_asset ON album_assets (asset_id);
+-- Members of the album being refreshed, swapped into album_assets once it is complete
+CREATE TEMP TABLE IF NOT EXISTS album_assets_staging (
+    asset_id TEXT PRIMARY KEY
+);
+"""
+
+ASSET_COLUMNS = ('id, type, original_filename, file_created_at, file_modified_at, '
+                 'updated_at, is_favorite, is_archived, duration, thumbhash')
+
+class AlbumIndex:
+    """Local index of album contents, synced incrementally from Immich.
+
+    /api/albums is cheap and reports updatedAt and assetCount for every album,
+    so only albums whose values changed since the last sync are refetched.
+    Random sampling then runs against the local database.
+    """
+
+    def __init__(self, db_path: str, client: ImmichAPIClient, sync_interval: float = 60):
+        self.db_path = db_path
+        self.client = client
+        self.sync_interval = sync_interval
+        self._db_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # monotonic() time of the last sync; None until the first one
+        self._last_sync: Optional[float] = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Bring an index created by an older version up to the current schema"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(assets)')}
+        if 'thumbhash' not in columns:
+            self._conn.execute('ALTER TABLE assets ADD COLUMN thumbhash TEXT')
+            # Refetch every album on the next sync to fill in the new column
+            self._conn.execute('UPDATE albums SET synced_at = NULL')
+            logger.info("Added thumbhash to album index, albums will be reindexed")
+
+    def sync(self, album_names: List[str], force: bool = False):
+        """Refresh index entries for the named albums that changed in Immich"""
+        with self._sync_lock:
+            if not force and self._last_sync is not None and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            if self.client.offline:
+                # Serve the index as it is; the connection watcher syncs again once Immich is back
+                return
+
+            albums = self.client.get_albums()
+            if not albums:
+                # Either Immich is unreachable or there really are no albums;
+                # keep serving what we have rather than wiping the index
+                logger.warning("No albums returned from Immich, keeping existing album index")
+                return
+
+            with self._db_lock:
+                known = {
+                    row[0]: (row[1], row[2], row[3])
+                    for row in self._conn.execute('SELECT id, updated_at, asset_count, synced_at FROM albums')
+                }
+
+            wanted = [album for album in albums if album.name in album_names]
+            for album in wanted:
+                state = known.get(album.id)
+                if state is not None and state[2] is not None and state[:2] == (album.updated_at, album.asset_count):
+                    self._update_album_row(album, refreshed=False)
+                    continue
+                self._refresh_album(album)
+
+            self._prune({album.id for album in albums})
+            self._last_sync = time.monotonic()
+
+    def _update_album_row(self, album: Album, refreshed: bool):
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO albums (id, name, updated_at, asset_count, synced_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET name = excluded.name'
+                + (', updated_at = excluded.updated_at, asset_count = excluded.asset_count, '
+                   'synced_at = excluded.synced_at' if refreshed else ''),
+                (album.id, album.name, album.updated_at, album.asset_count, time.time() if refreshed else None)
+            )
+
+    def _refresh_album(self, album: Album):
+        """Replace the indexed assets of one album.
+
+        The album arrives page by page and each page is written as it comes,
+        so memory is bounded by the page size. Membership is staged and swapped
+        in with one transaction at the end; if fetching fails midway, the old
+        index of the album stays as it was.
+        """
+        with self._db_lock, self._conn:
+            self._conn.execute('DELETE FROM album_assets_staging')
+        count = 0
+        try:
+            for assets in self.client.iter_album_asset_pages(album.id):
+                with self._db_lock, self._conn:
+                    self._conn.executemany(
+                        f'INSERT OR REPLACE INTO assets ({ASSET_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        [
+                            (asset.id, asset.type, asset.original_filename, asset.file_created_at,
+                             asset.file_modified_at, asset.updated_at, int(asset.is_favorite),
+                             int(asset.is_archived), asset.duration, asset.thumbhash)
+                            for asset in assets
+                        ]
+                    )
+                    self._conn.executemany(
+                        'INSERT OR IGNORE INTO album_assets_staging (asset_id) VALUES (?)',
+                        [(asset.id,) for asset in assets]
+                    )
+                count += len(assets)
+        except Exception as e:
+            logger.warning(f"Failed to fetch assets of album '{album.name}', keeping old index: {e}")
+            return
+
+        with self._db_lock, self._conn:
+            self._conn.execute('DELETE FROM album_assets WHERE album_id = ?', (album.id,))
+            self._conn.execute(
+                'INSERT INTO album_assets (album_id, asset_id) SELECT ?, asset_id FROM album_assets_staging',
+                (album.id,)
+            )
+            self._conn.execute('DELETE FROM album_assets_staging')
+        self._update_album_row(album, refreshed=True)
+        logger.info(f"Indexed {count} assets from album '{album.name}'")
+
+    def _prune(self, existing_album_ids):
+        """Drop albums deleted in Immich and assets no longer in any indexed album"""
+        with self._db_lock, self._conn:
+            indexed = [row[0] for row in self._conn.execute('SELECT id FROM albums')]
+            removed = [album_id for album_id in indexed if album_id not in existing_album_ids]
+            for album_id in removed:
+                self._conn.execute('DELETE FROM album_assets WHERE album_id = ?', (album_id,))
+                self._conn.execute('DELETE FROM albums WHERE id = ?', (album_id,))
+            self._conn.execute('DELETE FROM assets WHERE id NOT IN (SELECT asset_id FROM album_assets)')
+        if removed:
+            logger.info(f"Removed {len(removed)} deleted albums from album index")
+
+    def get_random_photos(self, album_names: List[str], count: int = 20) -> List[Asset]:
+        """Get random photos from the named albums, syncing the index first if due"""
+        try:
+            self.sync(album_names)
+        except Exception as e:
+            logger.error(f"Error syncing album index, sampling from existing index: {e}")
+
+        if not album_names:
+            return []
+        with self._db_lock:
+            rows = self._conn.execute(
+                f'SELECT {ASSET_COLUMNS} FROM assets WHERE id IN ({self._pool_query(album_names)}) '
+                f'AND upper(type) = \'IMAGE\' AND is_archived = 0 '
+                f'ORDER BY RANDOM() LIMIT ?',
+                (*album_names, count)
+            ).fetchall()
+
+        logger.info(f"Sampled {len(rows)} random photos from album index")
+        return [self._row_to_asset(row) for row in rows]
+
+    @staticmethod
+    def _pool_query(album_names: List[str]) -> str:
+        """Subquery selecting asset ids of the named albums"""
+        placeholders = ', '.join('?' for _ in album_names)
+        return ('SELECT album_assets.asset_id FROM album_assets '
+                'JOIN albums ON albums.id = album_assets.album_id '
+                f'WHERE albums.name IN ({placeholders})')
+
+    @staticmethod
+    def _row_to_asset(row) -> Asset:
+        return Asset(
+            id=row[0],
+            type=row[1],
+            original_filename=row[2],
+            file_created_at=row[3],
+            file_modified_at=row[4],
+            updated_at=row[5],
+            is_favorite=bool(row[6]),
+            is_archived=bool(row[7]),
+            duration=row[8],
+            thumbhash=row[9]
+        )
+
+    def get_albums(self, album_names: List[str]) -> List[Album]:
+        """Get the named albums known to the index"""
+        if not album_names:
+            return []
+        placeholders = ', '.join('?' for _ in album_names)
+        with self._db_lock:
+            rows = self._conn.execute(
+                f'SELECT id, name, updated_at, asset_count FROM albums WHERE name IN ({placeholders}) ORDER BY id',
+                tuple(album_names)
+            ).fetchall()
+        return [Album(id=row[0], name=row[1], updated_at=row[2], asset_count=row[3]) for row in rows]
+
+    def pool_signature(self, album_names: List[str]) -> str:
+        """Fingerprint of the photo pool; changes whenever a named album is re-indexed"""
+        if not album_names:
+            return ''
+        placeholders = ', '.join('?' for _ in album_names)
+        with self._db_lock:
+            rows = self._conn.execute(
+                f'SELECT id, updated_at, asset_count, synced_at FROM albums '
+                f'WHERE name IN ({placeholders}) AND synced_at IS NOT NULL ORDER BY id',
+                tuple(album_names)
+            ).fetchall()
+        return hashlib.sha1(repr(rows).encode('utf-8')).hexdigest()
+
+    def get_pool_ids(self, album_names: List[str]) -> List[str]:
+        """Get ids of all displayable photos in the named albums"""
+        if not album_names:
+            return []
+        with self._db_lock:
+            rows = self._conn.execute(
+                f'SELECT id FROM assets WHERE id IN ({self._pool_query(album_names)}) '
+                f'AND upper(type) = \'IMAGE\' AND is_archived = 0 ORDER BY id',
+                tuple(album_names)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_assets(self, asset_ids: List[str]) -> List[Asset]:
+        """Get indexed assets by id, in the given order; unknown ids are skipped"""
+        if not asset_ids:
+            return []
+        placeholders = ', '.join('?' for _ in asset_ids)
+        with self._db_lock:
+            rows = self._conn.execute(
+                f'SELECT {ASSET_COLUMNS} FROM assets WHERE id IN ({placeholders})',
+                tuple(asset_ids)
+            ).fetchall()
+        by_id = {row[0]: self._row_to_asset(row) for row in rows}
+        return [by_id[asset_id] for asset_id in asset_ids if asset_id in by_id]
+
+    def stats(self):
+        """Return index statistics"""
+        with self._db_lock:
+            albums = self._conn.execute('SELECT COUNT(*) FROM albums WHERE synced_at IS NOT NULL').fetchone()[0]
+            assets = self._conn.execute('SELECT COUNT(*) FROM assets').fetchone()[0]
+        return {'albums': albums, 'assets': assets}
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Image Cache - Persistent size-bounded on-disk cache for proxied Immich images
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from immich_api_client import ImageData
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CacheEntry:
+    """Represents one cached image file"""
+    path: str
+    size: int
+    asset_id: str
+    variant: str
+    version: str
+    content_type: str
+
+class DiskImageCache:
+    """Content-addressed LRU cache of image bytes stored on disk.
+
+    Entries are keyed by asset id, size variant and the asset's updatedAt, so a
+    changed asset simply gets a new key and the stale file ages out. Every file
+    starts with a single JSON header line, which lets the index be rebuilt from
+    disk after a restart. LRU order is persisted through file mtimes.
+
+    The most recently stored version of each asset variant is also tracked, so
+    get_stale() can serve an image while Immich cannot tell its current version.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._latest = {}  # (asset_id, variant) -> key of the newest stored version
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(asset_id: str, variant: str, version: Optional[str]) -> str:
+        """Build the content address for an asset variant"""
+        raw = f"{asset_id}:{variant}:{version or ''}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _load(self):
+        """Rebuild the in-memory index from files left by a previous run"""
+        found = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    # Leftover from an interrupted write
+                    self._remove_file(path)
+                    continue
+                try:
+                    with open(path, 'rb') as f:
+                        header = json.loads(f.readline())
+                    stat = os.stat(path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Dropping unreadable cache file {path}: {e}")
+                    self._remove_file(path)
+                    continue
+                entry = CacheEntry(
+                    path=path,
+                    size=stat.st_size,
+                    asset_id=header.get('asset_id', ''),
+                    variant=header.get('variant', ''),
+                    version=header.get('version', ''),
+                    content_type=header.get('content_type', 'image/jpeg')
+                )
+                found.append((stat.st_mtime, name, entry))
+
+        # Oldest first, so the most recently used files end up at the MRU end
+        found.sort(key=lambda item: item[0])
+        for _mtime, key, entry in found:
+            self._entries[key] = entry
+            self._latest[(entry.asset_id, entry.variant)] = key
+            self._total_bytes += entry.size
+
+        logger.info(f"Image cache loaded {len(self._entries)} files ({self._total_bytes} bytes) from {self.cache_dir}")
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _forget(self, key: str) -> Optional[CacheEntry]:
+        """Drop an entry from the index. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+            if self._latest.get((entry.asset_id, entry.variant)) == key:
+                del self._latest[(entry.asset_id, entry.variant)]
+        return entry
+
+    def _evict(self):
+        """Drop least recently used entries until the byte budget fits. Caller holds the lock."""
+        while self._entries and self._total_bytes > self.max_bytes:
+            key = next(iter(self._entries))
+            entry = self._forget(key)
+            self._remove_file(entry.path)
+            logger.debug(f"Evicted {entry.asset_id} ({entry.variant}) from image cache")
+
+    def contains(self, asset_id: str, variant: str, version: Optional[str] = None) -> bool:
+        """Check for an entry without reading it or touching its LRU position"""
+        key = self.make_key(asset_id, variant, version)
+        with self._lock:
+            return key in self._entries
+
+    def get(self, asset_id: str, variant: str, version: Optional[str] = None) -> Optional[ImageData]:
+        """Return cached image data or None on a miss"""
+        return self._read(self.make_key(asset_id, variant, version), asset_id, variant)
+
+    def get_stale(self, asset_id: str, variant: str) -> Optional[ImageData]:
+        """Return the newest cached version of an asset variant, whatever its version"""
+        with self._lock:
+            key = self._latest.get((asset_id, variant))
+        if key is None:
+            return None
+        return self._read(key, asset_id, variant, stale=True)
+
+    def _read(self, key: str, asset_id: str, variant: str, stale: bool = False) -> Optional[ImageData]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if not stale:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(entry.path, 'rb') as f:
+                f.readline()
+                content = f.read()
+            # Persist the LRU position across restarts
+            os.utime(entry.path)
+        except OSError as e:
+            logger.warning(f"Cached image {asset_id} ({variant}) is unreadable: {e}")
+            with self._lock:
+                self._forget(key)
+                if not stale:
+                    self.misses += 1
+            return None
+
+        with self._lock:
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        return ImageData(content=content, content_type=entry.content_type)
+
+    def put(self, asset_id: str, variant: str, version: Optional[str], image_data: ImageData):
+        """Store image data, evicting old entries if the budget is exceeded"""
+        header = json.dumps({
+            'asset_id': asset_id,
+            'variant': variant,
+            'version': version or '',
+            'content_type': image_data.content_type
+        }).encode('utf-8') + b'\n'
+        size = len(header) + len(image_data.content)
+        if size > self.max_bytes:
+            logger.debug(f"Image {asset_id} ({variant}) is larger than the whole cache, not caching")
+            return
+
+        key = self.make_key(asset_id, variant, version)
+        path = self._path_for(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(header)
+                f.write(image_data.content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write {asset_id} ({variant}) to image cache: {e}")
+            self._remove_file(tmp_path)
+            return
+
+        entry = CacheEntry(
+            path=path,
+            size=size,
+            asset_id=asset_id,
+            variant=variant,
+            version=version or '',
+            content_type=image_data.content_type
+        )
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = entry
+            self._latest[(asset_id, variant)] = key
+            self._total_bytes += size
+            self._evict()
+
+    def stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits
+            }
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Image Resize - Server-side resizing of Immich images to the kiosk's display size
+"""
+
+import io
+import math
+import logging
+import threading
+from typing import Optional, Tuple
+from immich_api_client import ImageData
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+    ImageOps = None
+    features = None
+
+# Target sizes are rounded up to this step so similar screens share cached variants
+RESIZE_STEP = 128
+MAX_DIMENSION = 7680
+# Longest side of Immich's 'preview' size; larger targets need the 'fullsize' image
+PREVIEW_MAX_SIDE = 1440
+# Larger 'fullsize' sources are not downloaded; the preview is resized instead
+MAX_SOURCE_BYTES = 32 * 1024 * 1024
+# Resizes running at once; each holds a source and its decoded pixels in memory
+MAX_CONCURRENT_RESIZES = 2
+_resize_slots = threading.BoundedSemaphore(MAX_CONCURRENT_RESIZES)
+# Fullsize sources held at once, from their download until they are resized
+MAX_CONCURRENT_SOURCES = 2
+source_slots = threading.BoundedSemaphore(MAX_CONCURRENT_SOURCES)
+# EXIF orientations that swap width and height
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg')
+}
+
+def _check_feature(name: str) -> bool:
+    try:
+        return bool(features.check(name))
+    except Exception:
+        return False
+
+AVAILABLE = Image is not None
+SUPPORTED_FORMATS = ['jpeg']
+if AVAILABLE:
+    # Preferred first
+    SUPPORTED_FORMATS = [fmt for fmt in ('avif', 'webp') if _check_feature(fmt)] + ['jpeg']
+    logger.debug(f"Image resizing available, encoders: {SUPPORTED_FORMATS}")
+
+def negotiate_format(accept: Optional[str], avif: bool = False) -> str:
+    """Pick the best output format the client accepts.
+
+    AVIF is smaller but several times slower to encode, so it is only
+    offered when enabled; WebP is preferred otherwise.
+    """
+    accept = (accept or '').lower()
+    for fmt in SUPPORTED_FORMATS:
+        if fmt == 'jpeg' or (fmt == 'avif' and not avif):
+            continue
+        if FORMATS[fmt][1] in accept:
+            return fmt
+    return 'jpeg'
+
+def target_size(width: Optional[int], height: Optional[int], dpr: float = 1.0) -> Optional[Tuple[int, int]]:
+    """Compute the bucketed pixel box for a viewport, or None without a usable viewport"""
+    if not width and not height:
+        return None
+    if not math.isfinite(dpr):
+        return None
+    dpr = min(max(dpr, 0.5), 4.0)
+
+    def bucket(value):
+        if not value:
+            return MAX_DIMENSION
+        pixels = min(max(int(value * dpr), 1), MAX_DIMENSION)
+        return min(-(-pixels // RESIZE_STEP) * RESIZE_STEP, MAX_DIMENSION)
+
+    return bucket(width), bucket(height)
+
+def source_variant(size: Tuple[int, int]) -> str:
+    """Smallest Immich size that still covers the target box"""
+    return 'preview' if max(size) <= PREVIEW_MAX_SIDE else 'fullsize'
+
+def variant_key(source: str, size: Tuple[int, int], fmt: str) -> str:
+    """Cache variant name of a resized image"""
+    return f"{source}@{size[0]}x{size[1]}.{fmt}"
+
+def resize_image(image_data: ImageData, size: Tuple[int, int], fmt: str, quality: int = 80) -> ImageData:
+    """Fit an image into the target box (never upscaling) and encode it in the given format.
+
+    The EXIF orientation is applied (Immich serves the original JPEG as
+    'fullsize' when it does not generate one) and the ICC profile is kept,
+    so wide-gamut photos keep their colours.
+    """
+    with _resize_slots, Image.open(io.BytesIO(image_data.content)) as image:
+        transposed = image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS
+        # Let the JPEG decoder skip detail we are going to throw away anyway
+        image.draft('RGB', (size[1], size[0]) if transposed else size)
+        icc_profile = image.info.get('icc_profile') if image.mode in ('RGB', 'RGBA') else None
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        image.thumbnail(size, Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+
+        pil_format, content_type = FORMATS[fmt]
+        output = io.BytesIO()
+        save_options = {'quality': quality}
+        if icc_profile:
+            save_options['icc_profile'] = icc_profile
+        if fmt == 'jpeg':
+            save_options.update(optimize=True, progressive=True)
+        elif fmt == 'webp':
+            save_options['method'] = 4
+        image.save(output, format=pil_format, **save_options)
+
+    return ImageData(content=output.getvalue(), content_type=content_type)
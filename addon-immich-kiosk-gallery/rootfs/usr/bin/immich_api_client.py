@@ -3,16 +3,40 @@
 Immich API Client - Client for communicating with Immich API
 """
 
+import os
+import re
+import sys
+import json
+import time
+import random
 import logging
+import threading
 import requests
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, astuple
+from typing import Iterable, Iterator, List, Optional, Dict, Any
 from datetime import datetime
+import metrics
+from json_stream import CHUNK_SIZE, iter_response_array
+from singleflight import SingleFlight
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-@dataclass
+def json_loads(data):
+    """Decode JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+@dataclass(slots=True)
 class Asset:
     """Represents an Immich asset (photo/video)"""
     id: str
@@ -28,8 +52,10 @@ class Asset:
     city: Optional[str] = None
     state: Optional[str] = None
     country: Optional[str] = None
+    # Immich's compact placeholder of the image (base64), decoded by the kiosk page
+    thumbhash: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class Memory:
     """Represents an Immich memory"""
     id: str
@@ -43,7 +69,7 @@ class Memory:
         if self.assets is None:
             self.assets = []
 
-@dataclass
+@dataclass(slots=True)
 class Album:
     """Represents an Immich album"""
     id: str
@@ -58,59 +84,363 @@ class Album:
         if self.assets is None:
             self.assets = []
 
-@dataclass
+@dataclass(slots=True)
 class ImageData:
     """Represents image data with content type"""
     content: bytes
     content_type: str
 
+def parse_asset(asset_data: Dict[str, Any], user_names: Optional[Dict[str, str]] = None) -> Asset:
+    """Build an Asset from an Immich asset response.
+
+    Author and location are filled in when the response includes the owner and
+    EXIF info (single asset and search responses do). Without an embedded
+    owner, the author is looked up by ownerId in user_names. Repeated short
+    strings are interned so large album pools share them.
+    """
+    owner = asset_data.get('owner') or {}
+    exif = asset_data.get('exifInfo') or {}
+    author = owner.get('name') or owner.get('email')
+    if not author and user_names:
+        author = user_names.get(asset_data.get('ownerId'))
+    return Asset(
+        id=asset_data.get('id', ''),
+        type=sys.intern(asset_data.get('type', '')),
+        original_filename=asset_data.get('originalFileName', ''),
+        file_created_at=asset_data.get('fileCreatedAt'),
+        file_modified_at=asset_data.get('fileModifiedAt'),
+        updated_at=asset_data.get('updatedAt'),
+        is_favorite=asset_data.get('isFavorite', False),
+        is_archived=asset_data.get('isArchived', False),
+        duration=asset_data.get('duration'),
+        author=author,
+        city=exif.get('city'),
+        state=exif.get('state'),
+        country=exif.get('country'),
+        thumbhash=asset_data.get('thumbhash')
+    )
+
+def is_photo(asset_data: Dict[str, Any]) -> bool:
+    """Whether an asset response is a displayable photo: an image that is not archived"""
+    return asset_data.get('type') == 'IMAGE' and not asset_data.get('isArchived', False)
+
+def iter_photo_pages(assets_data: Iterable[Dict[str, Any]], size: Optional[int] = None) -> Iterator[List[Asset]]:
+    """Parse the photos among decoded assets into lists of at most size (ALBUM_PAGE_SIZE)"""
+    size = size or ALBUM_PAGE_SIZE
+    page = []
+    for asset_data in assets_data:
+        if is_photo(asset_data):
+            page.append(parse_asset(asset_data))
+            if len(page) >= size:
+                yield page
+                page = []
+    if page:
+        yield page
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Immich while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    After failure_threshold consecutive failures the circuit opens and calls are
+    rejected for reset_timeout seconds. Then a single trial call is let through
+    (half-open); its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Check whether a call may go upstream"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Immich is reachable again, closing circuit breaker")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    logger.warning(f"Immich failed {self._failures} times in a row, opening circuit breaker for {self.reset_timeout}s")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+class AssetInfoCache:
+    """In-process TTL cache for asset details with LRU eviction on max entries.
+
+    Expired entries are kept until evicted, so they can still be served while
+    Immich is unreachable (get_stale), and the cache can be saved to disk to
+    survive restarts.
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # asset_id -> (expires_at, Asset)
+        # Bumped on every change, so save() can skip rewriting an unchanged file
+        self._generation = 0
+        self._saved_generation = 0
+
+    def get(self, asset_id: str, updated_at: Optional[str] = None) -> Optional[Asset]:
+        """Return a cached asset, or None if missing, expired or the asset changed since"""
+        with self._lock:
+            cached = self._entries.get(asset_id)
+            if cached is not None:
+                expires_at, asset = cached
+                if updated_at and asset.updated_at != updated_at:
+                    del self._entries[asset_id]
+                    self._generation += 1
+                elif expires_at >= time.monotonic():
+                    self._entries.move_to_end(asset_id)
+                    self.hits += 1
+                    return asset
+            self.misses += 1
+            return None
+
+    def get_stale(self, asset_id: str) -> Optional[Asset]:
+        """Return a cached asset even if it expired, for when Immich cannot be asked"""
+        with self._lock:
+            cached = self._entries.get(asset_id)
+            if cached is None:
+                return None
+            self.stale_hits += 1
+            return cached[1]
+
+    def peek(self, asset_id: str) -> Optional[Asset]:
+        """Return an unexpired cached asset without counting a hit or miss"""
+        with self._lock:
+            cached = self._entries.get(asset_id)
+            if cached is None or cached[0] < time.monotonic():
+                return None
+            return cached[1]
+
+    def put(self, asset: Asset):
+        """Store asset details"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[asset.id] = (time.monotonic() + self.ttl, asset)
+            self._entries.move_to_end(asset.id)
+            self._generation += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self, path: str) -> bool:
+        """Write all entries to a JSON file, atomically; False (nothing written) if unchanged since the last save"""
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation
+            if generation == self._saved_generation:
+                return False
+            # Expiry as wall-clock time, monotonic time does not survive a restart
+            entries = [[time.time() + expires_at - now, astuple(asset)] for expires_at, asset in self._entries.values()]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+            # On disk before the rename, so a power cut cannot leave a truncated file behind
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._saved_generation = generation
+        return True
+
+    def load(self, path: str):
+        """Restore entries saved by save(); a missing or unreadable file is skipped"""
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+            keep = entries[-self.max_entries:] if self.max_entries > 0 else []
+            restored = [(expires_at, Asset(*fields)) for expires_at, fields in keep]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable asset details cache {path}: {e}")
+            return
+        now = time.monotonic()
+        wall_now = time.time()
+        with self._lock:
+            for expires_at, asset in restored:
+                self._entries[asset.id] = (now + expires_at - wall_now, asset)
+        logger.info(f"Loaded {len(restored)} cached asset details from {path}")
+
+    def invalidate(self, asset_id: Optional[str] = None):
+        """Drop one asset, or everything when no id is given"""
+        with self._lock:
+            if asset_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(asset_id, None)
+            self._generation += 1
+
+    def stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_hits': self.stale_hits,
+                'hit_ratio': round(self.hits / total, 3) if total else None
+            }
+
+# Responses worth retrying: rate limiting and transient gateway/server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Assets per search page when listing an album; bounds the memory of one album sync
+ALBUM_PAGE_SIZE = 1000
+
+_ID_SEGMENT = re.compile(r'^(/api/(?:assets|albums))/[^/]+')
+
+def endpoint_template(path: str) -> str:
+    """Metric label for an API path, with asset and album ids replaced by {id}"""
+    return _ID_SEGMENT.sub(r'\1/{id}', path)
+
 class ImmichAPIClient:
     """Client for communicating with Immich API"""
     
-    def __init__(self, base_url, api_key):
+    def __init__(self, base_url, api_key, asset_info_ttl=3600, asset_info_max_entries=5000, max_workers=8,
+                 pool_size=16, connect_timeout=5, read_timeout=30, retries=2, backoff=0.5,
+                 breaker_threshold=5, breaker_timeout=30):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
         self.session = requests.Session()
         self.session.headers.update({
             'x-api-key': api_key,
             'Content-Type': 'application/json'
         })
+        # One host, so a single pool sized for all concurrent callers keeps connections alive
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breaker = CircuitBreaker(failure_threshold=breaker_threshold, reset_timeout=breaker_timeout)
+        self.asset_info_cache = AssetInfoCache(ttl=asset_info_ttl, max_entries=asset_info_max_entries)
+        # Concurrent lookups of the same asset share one upstream request
+        self.asset_info_flights = SingleFlight()
+        # Shared by all requests, so the limit bounds the total load put on Immich
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='immich-enrich')
+        # None until the first search call tells us whether the server has /api/search/*
+        self.search_supported = None
+        # Set while the connection watcher finds Immich unreachable; calls then fail fast
+        self.offline = False
+        self.last_success_at = None
+        self._user_names = None
+        self._user_names_expires_at = 0.0
         
+    def _request(self, method: str, path: str, retry: bool = True, probe: bool = False, **kwargs) -> requests.Response:
+        """Send a request to Immich with timeouts, retries and the circuit breaker.
+
+        Connection errors, timeouts and RETRY_STATUSES are retried with jittered
+        exponential backoff. The last response is returned even if it is an
+        error status; the last exception is re-raised. While offline, only
+        probe requests (connection checks) go upstream.
+        """
+        endpoint = endpoint_template(path)
+        if not probe and self.offline:
+            metrics.UPSTREAM_ERRORS.inc(method=method, endpoint=endpoint, reason='offline')
+            raise CircuitOpenError(f"Immich is offline, not calling {path}")
+        if not probe and not self.breaker.allow():
+            metrics.UPSTREAM_ERRORS.inc(method=method, endpoint=endpoint, reason='circuit_open')
+            raise CircuitOpenError(f"Immich is unavailable, not calling {path}")
+
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        attempts = self.retries + 1 if retry else 1
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.UPSTREAM_LATENCY.observe(time.perf_counter() - started, method=method, endpoint=endpoint)
+                metrics.UPSTREAM_ERRORS.inc(
+                    method=method, endpoint=endpoint,
+                    reason='timeout' if isinstance(e, requests.Timeout) else 'connection'
+                )
+                if last_attempt:
+                    self.breaker.record_failure()
+                    raise
+                logger.debug(f"{method} {path} failed ({e}), retrying")
+            else:
+                metrics.UPSTREAM_LATENCY.observe(time.perf_counter() - started, method=method, endpoint=endpoint)
+                if response.status_code >= 400:
+                    metrics.UPSTREAM_ERRORS.inc(method=method, endpoint=endpoint, reason=str(response.status_code))
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    self.last_success_at = time.time()
+                    return response
+                if last_attempt:
+                    self.breaker.record_failure()
+                    return response
+                logger.debug(f"{method} {path} returned HTTP {response.status_code}, retrying")
+                response.close()
+            # Full jitter keeps several kiosks from retrying in lockstep
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
     def test_connection(self):
         """Test connection to Immich server"""
         try:
-            response = self.session.get(f"{self.base_url}/api/users/me", timeout=10)
+            response = self._request('GET', '/api/users/me', retry=False, probe=True)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Failed to connect to Immich server: {e}")
             return False
     
-    def get_memories(self) -> List[Memory]:
-        """Get memories from Immich API"""
+    def get_memories(self) -> Optional[List[Memory]]:
+        """Get memories from Immich API; None if they could not be fetched.
+
+        The response is decoded one memory at a time, and only the photos of
+        each memory are kept.
+        """
         try:
             logger.info("Fetching memories from Immich API...")
-            response = self.session.get(f"{self.base_url}/api/memories", timeout=30)
+            response = self._request('GET', '/api/memories', stream=True)
             
             if response.status_code == 200:
-                memories_data = response.json()
                 memories = []
                 
-                for memory_data in memories_data:
-                    # Convert assets to Asset objects
-                    assets = []
-                    for asset_data in memory_data.get('assets', []):
-                        asset = Asset(
-                            id=asset_data.get('id', ''),
-                            type=asset_data.get('type', ''),
-                            original_filename=asset_data.get('originalFileName', ''),
-                            file_created_at=asset_data.get('fileCreatedAt'),
-                            file_modified_at=asset_data.get('fileModifiedAt'),
-                            updated_at=asset_data.get('updatedAt'),
-                            is_favorite=asset_data.get('isFavorite', False),
-                            is_archived=asset_data.get('isArchived', False),
-                            duration=asset_data.get('duration')
-                        )
-                        assets.append(asset)
+                for memory_data in iter_response_array(response):
+                    # Convert photos to Asset objects; those with EXIF info need no enrichment call
+                    assets = self.cache_enriched_assets(
+                        asset_data for asset_data in memory_data.get('assets', []) if is_photo(asset_data)
+                    )
                     
                     memory = Memory(
                         id=memory_data.get('id', ''),
@@ -125,81 +455,133 @@ class ImmichAPIClient:
                 logger.info(f"Retrieved {len(memories)} memories from Immich")
                 return memories
             else:
+                response.close()
                 logger.error(f"Failed to fetch memories: HTTP {response.status_code}")
-                return []
+                return None
                 
         except Exception as e:
             logger.error(f"Error fetching memories: {e}")
-            return []
+            return None
     
-    def get_asset_info(self, asset_id: str) -> Optional[Asset]:
-        """Get detailed information about an asset, including author and location"""
+    def get_asset_info(self, asset_id: str, updated_at: Optional[str] = None) -> Optional[Asset]:
+        """Get detailed information about an asset, including author and location.
+
+        Results are cached; passing the asset's known updated_at invalidates a
+        cached entry that was fetched before the asset changed.
+        """
+        cached = self.asset_info_cache.get(asset_id, updated_at)
+        if cached is not None:
+            metrics.ENRICHMENT_ASSETS.inc(source='cache')
+            return cached
+        asset = None
+        if not self.offline:
+            asset, shared = self.asset_info_flights.do(asset_id, lambda: self._fetch_asset_info(asset_id))
+            if shared:
+                metrics.COALESCED_REQUESTS.inc(kind='asset_info')
+        if asset is None:
+            # Immich is unreachable or failed; details fetched earlier beat none at all
+            asset = self.asset_info_cache.get_stale(asset_id)
+            if asset is not None:
+                metrics.ENRICHMENT_ASSETS.inc(source='stale')
+        return asset
+
+    def _fetch_asset_info(self, asset_id: str) -> Optional[Asset]:
         try:
-            response = self.session.get(f"{self.base_url}/api/assets/{asset_id}", timeout=10)
+            response = self._request('GET', f"/api/assets/{asset_id}")
             if response.status_code == 200:
-                asset_data = response.json()
-                # Author
-                owner = asset_data.get('owner', {})
-                author = owner.get('name') or owner.get('email')
-                # Location
-                exif = asset_data.get('exifInfo', {})
-                city = exif.get('city')
-                state = exif.get('state')
-                country = exif.get('country')
-                return Asset(
-                    id=asset_data.get('id', ''),
-                    type=asset_data.get('type', ''),
-                    original_filename=asset_data.get('originalFileName', ''),
-                    file_created_at=asset_data.get('fileCreatedAt'),
-                    file_modified_at=asset_data.get('fileModifiedAt'),
-                    updated_at=asset_data.get('updatedAt'),
-                    is_favorite=asset_data.get('isFavorite', False),
-                    is_archived=asset_data.get('isArchived', False),
-                    duration=asset_data.get('duration'),
-                    author=author,
-                    city=city,
-                    state=state,
-                    country=country
-                )
+                asset = parse_asset(json_loads(response.content))
+                self.asset_info_cache.put(asset)
+                metrics.ENRICHMENT_ASSETS.inc(source='lookup')
+                return asset
             return None
         except Exception as e:
             logger.error(f"Error fetching asset info for {asset_id}: {e}")
             return None
     
+    def get_assets_info(self, assets: List[Asset]) -> List[Optional[Asset]]:
+        """Get detailed information for many assets concurrently.
+
+        Results keep the input order; a failed lookup yields None in its slot.
+        """
+        started = time.perf_counter()
+        futures = [
+            self.executor.submit(self.get_asset_info, asset.id, asset.updated_at)
+            for asset in assets
+        ]
+        results = []
+        for asset, future in zip(assets, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Error fetching asset info for {asset.id}: {e}")
+                results.append(None)
+        metrics.ENRICHMENT_DURATION.observe(time.perf_counter() - started, source='per_asset')
+        return results
+    
     def get_asset_thumbnail_url(self, asset_id: str, size: str = 'thumbnail') -> str:
         """Get thumbnail URL for an asset - using local proxy"""
         return f"/api/proxy/thumbnail/{asset_id}?size={size}"
     
-    def get_asset_image_data(self, asset_id: str, size: str = 'thumbnail') -> Optional[ImageData]:
-        """Get image data from Immich API"""
+    def get_asset_image_data(self, asset_id: str, size: str = 'thumbnail', max_bytes: Optional[int] = None) -> Optional[ImageData]:
+        """Get image data from Immich API; None if the image is larger than max_bytes"""
         try:
-            url = f"{self.base_url}/api/assets/{asset_id}/thumbnail?size={size}"
-            response = self.session.get(url, timeout=30)
+            response = self._request('GET', f"/api/assets/{asset_id}/thumbnail", params={'size': size},
+                                     stream=max_bytes is not None)
             
             if response.status_code == 200:
+                if max_bytes is None:
+                    content = response.content
+                else:
+                    content = self._read_limited(response, max_bytes)
+                    if content is None:
+                        logger.warning(f"Image {asset_id} ({size}) is larger than {max_bytes} bytes, not downloading it")
+                        return None
                 return ImageData(
-                    content=response.content,
+                    content=content,
                     content_type=response.headers.get('Content-Type', 'image/jpeg')
                 )
             else:
                 logger.error(f"Failed to fetch image {asset_id}: HTTP {response.status_code}")
+                response.close()
                 return None
                 
         except Exception as e:
             logger.error(f"Error fetching image {asset_id}: {e}")
             return None
 
-    def get_asset_full_image_stream(self, asset_id: str):
-        """Get full-size image stream from Immich API for streaming response"""
+    @staticmethod
+    def _read_limited(response: requests.Response, max_bytes: int) -> Optional[bytes]:
+        """Read a streamed body, giving up (None) as soon as it exceeds max_bytes"""
+        try:
+            if int(response.headers.get('Content-Length', 0)) > max_bytes:
+                return None
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    return None
+                chunks.append(chunk)
+            return b''.join(chunks)
+        finally:
+            response.close()
+
+    def get_asset_full_image_stream(self, asset_id: str, headers: Optional[Dict[str, str]] = None):
+        """Get full-size image stream from Immich API for streaming response.
+
+        Extra headers (Range, If-None-Match, ...) are forwarded, so besides 200
+        the returned response may be 206 Partial Content or 304 Not Modified.
+        The caller must close the returned response.
+        """
         try:
-            url = f"{self.base_url}/api/assets/{asset_id}/original"
-            response = self.session.get(url, timeout=60, stream=True)
+            response = self._request('GET', f"/api/assets/{asset_id}/original", headers=headers, stream=True)
             
-            if response.status_code == 200:
+            if response.status_code in (200, 206, 304):
                 content_type = response.headers.get('Content-Type', 'image/jpeg')
                 return response, content_type
             else:
                 logger.error(f"Failed to fetch full image {asset_id}: HTTP {response.status_code}")
+                response.close()
                 return None, None
                 
         except Exception as e:
@@ -210,10 +592,10 @@ class ImmichAPIClient:
         """Get all albums from Immich API"""
         try:
             logger.info("Fetching albums from Immich API...")
-            response = self.session.get(f"{self.base_url}/api/albums", timeout=30)
+            response = self._request('GET', '/api/albums')
             
             if response.status_code == 200:
-                albums_data = response.json()
+                albums_data = json_loads(response.content)
                 albums = []
                 
                 for album_data in albums_data:
@@ -237,41 +619,160 @@ class ImmichAPIClient:
             logger.error(f"Error fetching albums: {e}")
             return []
     
-    def get_album_assets(self, album_id: str) -> List[Asset]:
-        """Get assets from a specific album"""
+    def get_album_assets(self, album_id: str) -> Optional[List[Asset]]:
+        """Get the photos (non-archived images) of an album; None if they could not be fetched.
+
+        The result holds the whole album; the album index consumes
+        iter_album_asset_pages instead, so its memory stays bounded.
+        """
         try:
-            logger.info(f"Fetching assets from album {album_id}...")
-            response = self.session.get(f"{self.base_url}/api/albums/{album_id}", timeout=30)
-            
-            if response.status_code == 200:
-                album_data = response.json()
-                assets_data = album_data.get('assets', [])
-                assets = []
-                
-                for asset_data in assets_data:
-                    asset = Asset(
-                        id=asset_data.get('id', ''),
-                        type=asset_data.get('type', ''),
-                        original_filename=asset_data.get('originalFileName', ''),
-                        file_created_at=asset_data.get('fileCreatedAt'),
-                        file_modified_at=asset_data.get('fileModifiedAt'),
-                        updated_at=asset_data.get('updatedAt'),
-                        is_favorite=asset_data.get('isFavorite', False),
-                        is_archived=asset_data.get('isArchived', False),
-                        duration=asset_data.get('duration')
-                    )
-                    assets.append(asset)
-                
-                logger.info(f"Retrieved {len(assets)} assets from album {album_id}")
-                return assets
-            else:
-                logger.error(f"Failed to fetch album {album_id}: HTTP {response.status_code}")
-                return []
-                
+            return [asset for page in self.iter_album_asset_pages(album_id) for asset in page]
         except Exception as e:
             logger.error(f"Error fetching album {album_id}: {e}")
-            return []
+            return None
+
+    def iter_album_asset_pages(self, album_id: str) -> Iterator[List[Asset]]:
+        """Yield the photos of an album in pages of at most ALBUM_PAGE_SIZE.
+
+        The album is paged through the search API, or on servers without it
+        the album response is decoded one asset at a time, so only one page is
+        held at a time. Raises on failure, also after some pages were yielded.
+        """
+        logger.info(f"Fetching assets from album {album_id}...")
+        result = self._search_album_page(album_id, 1)
+        pages = self._stream_album_pages(album_id) if result is None else self._search_album_pages(album_id, result)
+        count = 0
+        for assets in pages:
+            count += len(assets)
+            yield assets
+        logger.info(f"Retrieved {count} photos from album {album_id}")
+
+    def _search_album_page(self, album_id: str, page) -> Optional[Dict[str, Any]]:
+        """One page of an album's images from the metadata search; None if search is unavailable"""
+        return self._search('metadata', {'albumIds': [album_id], 'type': 'IMAGE', 'withExif': True,
+                                         'page': page, 'size': ALBUM_PAGE_SIZE})
+
+    def _search_album_pages(self, album_id: str, result: Dict[str, Any]) -> Iterator[List[Asset]]:
+        """Follow the metadata search pages of an album, starting from the first result.
+
+        The pages carry EXIF info, so the assets are cached as asset details on
+        the way and playlist pages need no per-asset lookups.
+        """
+        while True:
+            items = result.get('assets', {})
+            yield self.cache_enriched_assets(
+                asset_data for asset_data in items.get('items', []) if is_photo(asset_data)
+            )
+            page = items.get('nextPage')
+            if not page:
+                return
+            result = self._search_album_page(album_id, page)
+            if result is None:
+                raise RuntimeError(f"Search failed on page {page}")
+
+    def _stream_album_pages(self, album_id: str) -> Iterator[List[Asset]]:
+        """Decode the assets of the full album response as they arrive, in pages"""
+        response = self._request('GET', f"/api/albums/{album_id}", stream=True)
+        if response.status_code != 200:
+            response.close()
+            raise RuntimeError(f"Failed to fetch album {album_id}: HTTP {response.status_code}")
+        yield from iter_photo_pages(iter_response_array(response, 'assets'))
     
+    def get_user_names(self) -> Dict[str, str]:
+        """Get a map of user id to display name, cached like asset details"""
+        if self._user_names is not None and time.monotonic() < self._user_names_expires_at:
+            return self._user_names
+        try:
+            response = self._request('GET', '/api/users')
+            if response.status_code == 200:
+                self._user_names = {
+                    user.get('id'): user.get('name') or user.get('email')
+                    for user in json_loads(response.content)
+                }
+                self._user_names_expires_at = time.monotonic() + self.asset_info_cache.ttl
+            else:
+                logger.warning(f"Failed to fetch users: HTTP {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error fetching users: {e}")
+        return self._user_names or {}
+
+    def cache_enriched_assets(self, assets_data: Iterable[Dict[str, Any]]) -> List[Asset]:
+        """Parse assets from a response and cache those that carry EXIF info as asset details"""
+        started = time.perf_counter()
+        user_names = None
+        assets = []
+        for asset_data in assets_data:
+            if 'exifInfo' in asset_data:
+                if user_names is None:
+                    user_names = self.get_user_names()
+                asset = parse_asset(asset_data, user_names)
+                self.asset_info_cache.put(asset)
+                metrics.ENRICHMENT_ASSETS.inc(source='inline')
+            else:
+                asset = parse_asset(asset_data)
+            assets.append(asset)
+        metrics.ENRICHMENT_DURATION.observe(time.perf_counter() - started, source='inline')
+        return assets
+
+    def _search(self, kind: str, body: Dict[str, Any]):
+        """POST to /api/search/<kind>; returns the decoded body, or None if search is unavailable"""
+        if self.search_supported is False:
+            return None
+        response = self._request('POST', f"/api/search/{kind}", json=body)
+        if response.status_code in (404, 405):
+            logger.info("Immich server has no search API, falling back to per-album and per-asset requests")
+            self.search_supported = False
+            return None
+        if response.status_code != 200:
+            logger.error(f"Failed to search assets ({kind}): HTTP {response.status_code}")
+            return None
+        self.search_supported = True
+        return json_loads(response.content)
+
+    def search_random_assets(self, albums: List[Album], count: int = 20) -> Optional[List[Asset]]:
+        """Get random photos from albums, with author and location, in one request per album.
+
+        Uses Immich's server-side random search with EXIF info. Immich treats
+        several albumIds as "in all of these albums", so each album is searched
+        separately with a share of count proportional to its size. Returns None
+        when the server does not support search, a request failed or there are
+        no known album assets to search, so the caller can fall back to the
+        per-album path.
+        """
+        if self.offline:
+            return None
+        total = sum(album.asset_count for album in albums)
+        if not albums or total == 0:
+            return None
+        try:
+            assets_data = []
+            for album in albums:
+                if album.asset_count == 0:
+                    continue
+                album_data = self._search('random', {
+                    'albumIds': [album.id],
+                    'type': 'IMAGE',
+                    'withExif': True,
+                    'size': max(1, -(-count * album.asset_count // total))
+                })
+                if album_data is None:
+                    return None
+                assets_data.extend(album_data)
+
+            seen = set()
+            assets = []
+            for asset in self.cache_enriched_assets(assets_data):
+                if asset.id in seen or asset.type.upper() != 'IMAGE' or asset.is_archived:
+                    continue
+                seen.add(asset.id)
+                assets.append(asset)
+            random.shuffle(assets)
+            logger.info(f"Retrieved {min(len(assets), count)} random photos from Immich search")
+            return assets[:count]
+        except Exception as e:
+            logger.error(f"Error searching random assets: {e}")
+            return None
+
     def find_albums_by_name(self, album_names: List[str]) -> List[Album]:
         """Find albums by their names and return their IDs"""
         try:
@@ -304,9 +805,7 @@ class ImmichAPIClient:
             # Collect all assets from all albums
             all_assets = []
             for album in found_albums:
-                assets = self.get_album_assets(album.id)
-                # Filter only images (not videos) for photos
-                photo_assets = [asset for asset in assets if asset.type.upper() == 'IMAGE' and not asset.is_archived]
+                photo_assets = self.get_album_assets(album.id) or []
                 all_assets.extend(photo_assets)
                 logger.debug(f"Album '{album.name}' contributed {len(photo_assets)} photos")
             
@@ -6,12 +6,32 @@ Immich Kiosk Gallery - Simple photo slideshow from Immich
 import os
 import sys
 import json
+import struct
+import signal
+import queue
+import _thread
+import hmac
+import hashlib
+import time
+import functools
+import threading
 import logging
 import requests
-from datetime import datetime
-from flask import Flask, render_template, jsonify, Response, request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+from flask import Flask, render_template, jsonify, Response, request, g
 from flask_cors import CORS
 from immich_api_client import ImmichAPIClient, Asset, Album, Memory, ImageData
+from image_cache import DiskImageCache
+from album_index import AlbumIndex
+from playlist import PlaylistStore
+from prefetch import Prefetcher, PrefetchItem
+from singleflight import SingleFlight
+from session import SessionManager, SessionFullError, SessionNotFoundError
+import image_resize
+import metrics
+import profiling
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,11 +40,14 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__, template_folder='/usr/share/immich-kiosk/templates', static_folder='/usr/share/immich-kiosk/static')
 CORS(app)
 
+# Persistent addon storage (overridable for running outside Home Assistant)
+DATA_DIR = os.environ.get('IMMICH_KIOSK_DATA_DIR', '/data')
+
 # Load configuration
 def load_config():
     """Load configuration from Home Assistant options"""
     try:
-        with open('/data/options.json', 'r') as f:
+        with open(os.path.join(DATA_DIR, 'options.json'), 'r') as f:
             return json.load(f)
     except FileNotFoundError:
         logger.warning("Configuration file not found, using defaults")
@@ -34,7 +57,30 @@ def load_config():
             'immich_api_key': '',
             'immich_show_memories': True,
             'immich_show_albums': True,
-            'immich_albums': []
+            'immich_albums': [],
+            'image_cache_size_mb': 512,
+            'metadata_cache_ttl': 3600,
+            'metadata_cache_size': 5000,
+            'enrichment_workers': 8,
+            'album_sync_interval': 60,
+            'prefetch_depth': 5,
+            'prefetch_rate': 4,
+            'full_image_source': 'preview',
+            'resize_images': True,
+            'image_quality': 80,
+            'image_avif': False,
+            'server_threads': 8,
+            'server_keepalive_timeout': 120,
+            'server_shutdown_timeout': 10,
+            'immich_pool_size': 16,
+            'immich_connect_timeout': 5,
+            'immich_read_timeout': 30,
+            'immich_retries': 2,
+            'immich_circuit_breaker_timeout': 30,
+            'memories_cache_max_age': 21600,
+            'profiling_token': '',
+            'session_interval': 8,
+            'session_max_screens': 8
         }
 
 config = load_config()
@@ -49,19 +95,319 @@ if config.get('immich_url') and config.get('immich_api_key'):
     try:
         immich_client = ImmichAPIClient(
             base_url=config.get('immich_url'),
-            api_key=config.get('immich_api_key')
+            api_key=config.get('immich_api_key'),
+            asset_info_ttl=config.get('metadata_cache_ttl', 3600),
+            asset_info_max_entries=config.get('metadata_cache_size', 5000),
+            max_workers=config.get('enrichment_workers', 8),
+            pool_size=config.get('immich_pool_size', 16),
+            connect_timeout=config.get('immich_connect_timeout', 5),
+            read_timeout=config.get('immich_read_timeout', 30),
+            retries=config.get('immich_retries', 2),
+            breaker_timeout=config.get('immich_circuit_breaker_timeout', 30)
         )
-        if immich_client.test_connection():
-            logger.info("Successfully connected to Immich server")
-        else:
-            logger.warning("Failed to connect to Immich server")
-            immich_client = None
+        # The connection is established in the background, see watch_immich_connection()
     except Exception as e:
         logger.error(f"Failed to initialize Immich client: {e}")
         immich_client = None
+    if immich_client:
+        immich_client.asset_info_cache.load(os.path.join(DATA_DIR, 'asset_info_cache.json'))
 else:
     logger.info("Immich URL or API key not configured, running in demo mode")
 
+# Initialize local album index and playlists
+album_index = None
+playlist_store = None
+if immich_client:
+    try:
+        album_index = AlbumIndex(
+            db_path=os.path.join(DATA_DIR, 'album_index.db'),
+            client=immich_client,
+            sync_interval=config.get('album_sync_interval', 60)
+        )
+        playlist_store = PlaylistStore(
+            db_path=os.path.join(DATA_DIR, 'album_index.db'),
+            album_index=album_index
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize album index, albums will be fetched on every request: {e}")
+        album_index = None
+        playlist_store = None
+
+# Initialize on-disk image cache
+image_cache = None
+image_cache_size_mb = config.get('image_cache_size_mb', 512)
+if image_cache_size_mb > 0:
+    try:
+        image_cache = DiskImageCache(
+            cache_dir=os.path.join(DATA_DIR, 'image_cache'),
+            max_bytes=image_cache_size_mb * 1024 * 1024
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize image cache, images will not be cached: {e}")
+        image_cache = None
+
+def cache_stats():
+    """Statistics of the caches that count hits and misses, by metric label"""
+    caches = []
+    if image_cache is not None:
+        caches.append(('image', image_cache.stats()))
+    if immich_client is not None:
+        caches.append(('metadata', immich_client.asset_info_cache.stats()))
+    return caches
+
+def cache_hit_ratio(stats):
+    total = stats['hits'] + stats['misses']
+    return stats['hits'] / total if total else None
+
+metrics.REGISTRY.callback(
+    'immich_kiosk_cache_hits_total', 'Cache hits', 'counter', ('cache',),
+    lambda: [({'cache': name}, stats['hits']) for name, stats in cache_stats()]
+)
+metrics.REGISTRY.callback(
+    'immich_kiosk_cache_misses_total', 'Cache misses', 'counter', ('cache',),
+    lambda: [({'cache': name}, stats['misses']) for name, stats in cache_stats()]
+)
+metrics.REGISTRY.callback(
+    'immich_kiosk_cache_hit_ratio', 'Cache hits over lookups since start', 'gauge', ('cache',),
+    lambda: [({'cache': name}, cache_hit_ratio(stats)) for name, stats in cache_stats()]
+)
+metrics.REGISTRY.callback(
+    'immich_kiosk_cache_entries', 'Entries held by a cache', 'gauge', ('cache',),
+    lambda: [({'cache': name}, stats['entries']) for name, stats in cache_stats()]
+)
+metrics.REGISTRY.callback(
+    'immich_kiosk_image_cache_bytes', 'Bytes held by the on-disk image cache', 'gauge', (),
+    lambda: [({}, image_cache.stats()['bytes'])] if image_cache is not None else []
+)
+metrics.REGISTRY.callback(
+    'immich_kiosk_upstream_circuit_open', '1 while the circuit breaker stops calls to Immich', 'gauge', (),
+    lambda: [({}, int(immich_client.breaker.state == 'open'))] if immich_client is not None else []
+)
+metrics.REGISTRY.callback(
+    'immich_kiosk_upstream_offline', '1 while Immich is unreachable and stale data is served', 'gauge', (),
+    lambda: [({}, int(immich_client.offline))] if immich_client is not None else []
+)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('metrics_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if g.pop('metrics_started', None) is not None:
+        metrics.HTTP_IN_FLIGHT.dec()
+
+# Concurrent misses for the same image variant share one upstream fetch (or resize)
+image_flights = SingleFlight()
+
+def coalesced(kind, key, func):
+    """Run func once for all concurrent callers with the same key"""
+    result, shared = image_flights.do((kind,) + key, func)
+    if shared:
+        metrics.COALESCED_REQUESTS.inc(kind=kind)
+    return result
+
+def get_cached_image(asset_id, size, version=None):
+    """Get image data from the disk cache, falling back to Immich on a miss.
+
+    Returns (data, cache) with cache 'hit', 'miss' or 'stale': when Immich
+    cannot deliver the requested version, the newest cached version stands in.
+    """
+    if image_cache is not None:
+        image_data_obj = image_cache.get(asset_id, size, version)
+        if image_data_obj is not None:
+            logger.debug(f"Image cache hit for {asset_id} ({size})")
+            return image_data_obj, 'hit'
+
+    def fetch():
+        # A fullsize source is buffered for resizing, so its size is capped
+        max_bytes = image_resize.MAX_SOURCE_BYTES if size == 'fullsize' else None
+        image_data_obj = immich_client.get_asset_image_data(asset_id, size, max_bytes=max_bytes)
+        if image_data_obj is not None and image_cache is not None:
+            image_cache.put(asset_id, size, version, image_data_obj)
+        return image_data_obj
+
+    image_data_obj = coalesced('image', (asset_id, size, version), fetch)
+    if image_data_obj is None and image_cache is not None:
+        image_data_obj = image_cache.get_stale(asset_id, size)
+        if image_data_obj is not None:
+            logger.debug(f"Serving stale cached {asset_id} ({size})")
+            return image_data_obj, 'stale'
+    return image_data_obj, 'miss'
+
+def prefetch_asset(item):
+    """Warm an upcoming slide: its full image as the kiosk will request it, thumbnail and details"""
+    asset_id, version = item.asset_id, item.version
+    if item.size is not None:
+        variant = image_resize.variant_key(image_resize.source_variant(item.size), item.size, item.fmt)
+        if not image_cache.contains(asset_id, variant, version):
+            get_resized_image(asset_id, item.size, item.fmt, version)
+    elif not image_cache.contains(asset_id, 'preview', version):
+        # Streamed originals are not cached; the preview stands in for them while Immich is down
+        get_cached_image(asset_id, 'preview', version)
+    if not item.placeholder and not image_cache.contains(asset_id, 'thumbnail', version):
+        get_cached_image(asset_id, 'thumbnail', version)
+    immich_client.get_asset_info(asset_id, version)
+
+# Initialize background prefetcher (it warms the disk cache, so it needs one)
+prefetcher = None
+if immich_client and image_cache is not None and config.get('prefetch_depth', 5) > 0:
+    prefetcher = Prefetcher(
+        prefetch_asset=prefetch_asset,
+        depth=config.get('prefetch_depth', 5),
+        rate=config.get('prefetch_rate', 4)
+    )
+
+def asset_version(asset_id):
+    """Known updatedAt of an asset: from the versioned URL, else from the metadata cache"""
+    version = request.args.get('v')
+    if version:
+        return version
+    cached = immich_client.asset_info_cache.peek(asset_id)
+    return cached.updated_at if cached is not None else None
+
+def image_validators(asset_id, variant, version):
+    """Strong ETag and Last-Modified for an asset variant, or (None, None) if the version is unknown"""
+    if not version:
+        return None, None
+    etag = hashlib.sha1(f"{asset_id}:{variant}:{version}".encode('utf-8')).hexdigest()
+    try:
+        last_modified = datetime.fromisoformat(version.replace('Z', '+00:00'))
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+    except ValueError:
+        last_modified = None
+    return etag, last_modified
+
+def is_not_modified(etag, last_modified):
+    """Check the request's conditional headers against known validators"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def set_cache_headers(response, etag=None, last_modified=None):
+    """Add caching and validator headers to a proxy response"""
+    response.headers['Cache-Control'] = 'public, max-age=3600'  # Cache for 1 hour
+    response.headers['X-Proxy-Source'] = 'immich-kiosk'
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+def not_modified_response(etag, last_modified):
+    """Answer a revalidation without touching Immich"""
+    return set_cache_headers(Response(status=304), etag, last_modified)
+
+def image_response(image_data_obj, cache, variant, etag=None, last_modified=None):
+    """Build a proxy response for image data; cache is 'hit', 'miss' or 'stale'"""
+    response = Response(image_data_obj.content, mimetype=image_data_obj.content_type)
+    if cache == 'stale':
+        # Possibly an older version than asked for: no version validators, and
+        # the browser must ask again so it picks up the current one later
+        etag, last_modified = None, None
+    set_cache_headers(response, etag, last_modified)
+    if cache == 'stale':
+        response.headers['Cache-Control'] = 'no-cache'
+    if not etag:
+        # Version unknown, fall back to a content hash
+        response.add_etag()
+    response.headers['X-Proxy-Cache'] = cache.upper()
+    response = response.make_conditional(request)
+    if response.status_code != 304:
+        metrics.PROXY_BYTES.inc(response.content_length or 0, variant=variant, cache=cache)
+    return response
+
+def proxy_image(asset_id, variant):
+    """Serve a cached or freshly fetched image variant, honouring conditional requests"""
+    version = asset_version(asset_id)
+    etag, last_modified = image_validators(asset_id, variant, version)
+    if etag and is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    image_data_obj, cache = get_cached_image(asset_id, variant, version)
+    if image_data_obj is None:
+        return jsonify({'error': 'Image not found'}), 404
+    return image_response(image_data_obj, cache, variant, etag, last_modified)
+
+def proxy_urls(asset):
+    """Build proxy URLs for an asset, versioned by updatedAt so cached bytes never go stale"""
+    query = f"?v={quote(asset.updated_at)}" if asset.updated_at else ''
+    return {
+        'thumbnail_url': f"/api/proxy/thumbnail/{asset.id}{query}",
+        'full_image_url': f"/api/proxy/image/{asset.id}{query}"
+    }
+
+def serialize_assets(assets):
+    """Build the frontend payload for assets, enriched with author and location.
+
+    Asset details are fetched concurrently; a failed lookup leaves the
+    author/location fields empty instead of failing the whole collection.
+    """
+    assets_info = immich_client.get_assets_info(assets)
+    processed = []
+    for asset, asset_info in zip(assets, assets_info):
+        processed.append({
+            'id': asset.id,
+            'type': asset.type,
+            'original_filename': asset.original_filename,
+            'file_created_at': asset.file_created_at,
+            'file_modified_at': asset.file_modified_at,
+            'updated_at': asset.updated_at,
+            'is_favorite': asset.is_favorite,
+            'thumbhash': asset.thumbhash,
+            **proxy_urls(asset),
+            'author': asset_info.author if asset_info else None,
+            'city': asset_info.city if asset_info else None,
+            'state': asset_info.state if asset_info else None,
+            'country': asset_info.country if asset_info else None
+        })
+    return processed
+
+def profile_if_requested(view):
+    """Profile a request when it carries ?profile=<profiling_token>.
+
+    The cProfile report is saved under DATA_DIR/profiles and its breakdown is
+    added to the JSON response as 'profile'. Disabled unless the
+    profiling_token option is set. One request is profiled at a time; a
+    concurrent one is answered with 409.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = config.get('profiling_token')
+        # Compared as bytes: compare_digest rejects non-ASCII str, which would turn a bad token into a 500
+        supplied = request.args.get('profile', '').encode('utf-8')
+        if not token or not hmac.compare_digest(supplied, str(token).encode('utf-8')):
+            return view(*args, **kwargs)
+
+        try:
+            result, report = profiling.profile_call(request.endpoint, view, *args, **kwargs)
+        except profiling.ProfilerBusyError as e:
+            return jsonify({'success': False, 'error': f"Profiler busy: {e}"}), 409
+        try:
+            path = profiling.save_report(report, os.path.join(DATA_DIR, 'profiles'))
+        except OSError as e:
+            logger.error(f"Failed to save profile of {report.name}: {e}")
+            path = None
+        response = app.make_response(result)
+        if response.is_json:
+            payload = response.get_json()
+            payload['profile'] = report.summary(path)
+            response.set_data(json.dumps(payload))
+        return response
+    return wrapper
+
 @app.route('/')
 def index():
     """Main page"""
@@ -79,9 +425,25 @@ def api_config():
 
 @app.route('/health')
 def health():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: the server is up, whether or not Immich is)"""
     return jsonify({'status': 'ok', 'message': 'Immich Kiosk Gallery is running'})
 
+@app.route('/ready')
+def ready():
+    """Readiness endpoint: 200 once Immich is reachable and caches are warm, 503 before that"""
+    with immich_connection_lock:
+        state = dict(immich_connection)
+    if not immich_client:
+        return jsonify(dict(state, error='Immich not configured')), 503
+    # Between periodic checks, an open circuit breaker is the quickest sign that Immich went away
+    state['ready'] = state['ready'] and immich_client.breaker.state != 'open'
+    return jsonify(state), 200 if state['ready'] else 503
+
+@app.route('/metrics')
+def api_metrics():
+    """Prometheus metrics endpoint"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/proxy/thumbnail/<asset_id>')
 def proxy_thumbnail(asset_id):
     """Proxy endpoint for Immich thumbnails to hide API key"""
@@ -89,58 +451,278 @@ def proxy_thumbnail(asset_id):
         return jsonify({'error': 'Immich not configured'}), 400
     
     try:
-        image_data_obj = immich_client.get_asset_image_data(asset_id, 'thumbnail')
-        
-        if image_data_obj is not None:
-            response = Response(image_data_obj.content, mimetype=image_data_obj.content_type)
-            # Add cache headers
-            response.headers['Cache-Control'] = 'public, max-age=3600'  # Cache for 1 hour
-            response.headers['X-Proxy-Source'] = 'immich-kiosk'
-            return response
-        else:
-            return jsonify({'error': 'Image not found'}), 404
+        return proxy_image(asset_id, 'thumbnail')
             
     except Exception as e:
         logger.error(f"Error in proxy_thumbnail for {asset_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def image_format(accept):
+    """Resized image format for an Accept header; AVIF only when enabled"""
+    return image_resize.negotiate_format(accept, avif=config.get('image_avif', False))
+
+def display_size(width, height, dpr):
+    """Bucketed target size of a kiosk viewport, or None when full images are not resized.
+
+    full_image_source: original takes precedence over resize_images, so
+    originals are always streamed as they are.
+    """
+    if not config.get('resize_images', True) or not image_resize.AVAILABLE:
+        return None
+    if config.get('full_image_source', 'preview') == 'original':
+        return None
+    try:
+        width = int(width or 0)
+        height = int(height or 0)
+        dpr = float(dpr or 1)
+    except (TypeError, ValueError):
+        return None
+    if width < 0 or height < 0:
+        return None
+    return image_resize.target_size(width, height, dpr)
+
+def requested_display_size():
+    """Bucketed target size from the ?w=&h=&dpr= viewport, or None when not resizing"""
+    return display_size(request.args.get('w'), request.args.get('h'), request.args.get('dpr'))
+
+def get_resized_image(asset_id, size, fmt, version=None):
+    """Get an image resized to size in fmt, from the disk cache or resized from its source variant.
+
+    Returns (data, cache, resized); resized is False when the unresized source
+    is returned because resizing failed.
+    """
+    source = image_resize.source_variant(size)
+    variant = image_resize.variant_key(source, size, fmt)
+    image_data_obj = image_cache.get(asset_id, variant, version) if image_cache is not None else None
+    if image_data_obj is not None:
+        return image_data_obj, 'hit', True
+
+    def resize_from(source_data, source_cache):
+        if source_data is None:
+            if image_cache is not None:
+                stale = image_cache.get_stale(asset_id, variant)
+                if stale is not None:
+                    return stale, 'stale', True
+            return None, 'miss', False
+        try:
+            resized = image_resize.resize_image(source_data, size, fmt, config.get('image_quality', 80))
+            if image_cache is not None and source_cache != 'stale':
+                image_cache.put(asset_id, variant, version, resized)
+            return resized, 'stale' if source_cache == 'stale' else 'miss', True
+        except Exception as e:
+            logger.warning(f"Failed to resize {asset_id} to {variant}, serving unresized image: {e}")
+            return source_data, 'stale' if source_cache == 'stale' else 'miss', False
+
+    def resize():
+        if source == 'preview':
+            return resize_from(*get_cached_image(asset_id, 'preview', version))
+        # A fullsize source can be tens of MB, so only a few are held at once
+        with image_resize.source_slots:
+            source_data, source_cache = get_cached_image(asset_id, source, version)
+            if source_data is not None:
+                return resize_from(source_data, source_cache)
+        # Older Immich servers have no 'fullsize' size
+        return resize_from(*get_cached_image(asset_id, 'preview', version))
+
+    return coalesced('resize', (asset_id, variant, version), resize)
+
+def proxy_resized_image(asset_id, size):
+    """Serve an image resized to the display and encoded in the best format the client accepts"""
+    fmt = image_format(request.headers.get('Accept'))
+    variant = image_resize.variant_key(image_resize.source_variant(size), size, fmt)
+    version = asset_version(asset_id)
+    etag, last_modified = image_validators(asset_id, variant, version)
+    if etag and is_not_modified(etag, last_modified):
+        response = not_modified_response(etag, last_modified)
+        response.vary.add('Accept')
+        return response
+
+    image_data_obj, cache, resized = get_resized_image(asset_id, size, fmt, version)
+    if image_data_obj is None:
+        return jsonify({'error': 'Image not found'}), 404
+    if not resized:
+        etag, last_modified = None, None
+
+    response = image_response(image_data_obj, cache, 'resized', etag, last_modified)
+    response.vary.add('Accept')
+    return response
+
+# Headers forwarded between the browser and Immich when streaming originals
+STREAM_REQUEST_HEADERS = ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since')
+STREAM_RESPONSE_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag', 'Last-Modified')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def stream_original_image(asset_id):
+    """Stream an original image from Immich in chunks, without buffering the whole body"""
+    etag, last_modified = image_validators(asset_id, 'original', asset_version(asset_id))
+    if etag and is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+
+    upstream_headers = {
+        name: request.headers[name]
+        for name in STREAM_REQUEST_HEADERS
+        if name in request.headers
+    }
+    if etag:
+        # Our own validators are authoritative; Immich would not recognise them
+        upstream_headers.pop('If-None-Match', None)
+        upstream_headers.pop('If-Modified-Since', None)
+        upstream_headers.pop('If-Range', None)
+    upstream, content_type = immich_client.get_asset_full_image_stream(asset_id, headers=upstream_headers)
+    if upstream is None:
+        stale = image_cache.get_stale(asset_id, 'preview') if image_cache is not None else None
+        if stale is not None:
+            # Immich is unreachable; a cached preview beats a blank slide
+            return image_response(stale, 'stale', 'preview')
+        return jsonify({'error': 'Image not found'}), 404
+
+    def generate():
+        # Closing the generator (the client went away) releases the upstream connection
+        try:
+            for chunk in upstream.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                metrics.PROXY_BYTES.inc(len(chunk), variant='original', cache='stream')
+                yield chunk
+        finally:
+            upstream.close()
+
+    response = Response(generate(), status=upstream.status_code, mimetype=content_type, direct_passthrough=True)
+    for name in STREAM_RESPONSE_HEADERS:
+        if name in upstream.headers:
+            response.headers[name] = upstream.headers[name]
+    if 'Content-Encoding' in upstream.headers:
+        # iter_content decodes the body, so the upstream length no longer applies
+        response.headers.pop('Content-Length', None)
+    set_cache_headers(response, etag, last_modified)
+    response.call_on_close(upstream.close)
+    return response
+
 @app.route('/api/proxy/image/<asset_id>')
 def proxy_full_image(asset_id):
-    """Proxy endpoint for full-size Immich images"""
+    """Proxy endpoint for full-size Immich images, optionally resized to ?w=&h=&dpr="""
     if not immich_client:
         return jsonify({'error': 'Immich not configured'}), 400
     
     try:
-        # Get full-size image stream from API client
-        # response_stream, content_type = immich_client.get_asset_full_image_stream(asset_id)
-        
-        # if response_stream is not None:
-        #     def generate():
-        #         for chunk in response_stream.iter_content(chunk_size=8192):
-        #             yield chunk
-            
-        #     proxy_response = Response(generate(), mimetype=content_type)
-        #     proxy_response.headers['Cache-Control'] = 'public, max-age=3600'
-        #     proxy_response.headers['X-Proxy-Source'] = 'immich-kiosk'
-        #     return proxy_response
-        # else:
-        #     return jsonify({'error': 'Image not found'}), 404
-
-        image_data_obj = immich_client.get_asset_image_data(asset_id, 'preview')
-        
-        if image_data_obj is not None:
-            response = Response(image_data_obj.content, mimetype=image_data_obj.content_type)
-            # Add cache headers
-            response.headers['Cache-Control'] = 'public, max-age=3600'  # Cache for 1 hour
-            response.headers['X-Proxy-Source'] = 'immich-kiosk'
-            return response
-        else:
-            return jsonify({'error': 'Image not found'}), 404
+        if config.get('full_image_source', 'preview') == 'original':
+            return stream_original_image(asset_id)
+
+        size = requested_display_size()
+        if size is not None:
+            return proxy_resized_image(asset_id, size)
+
+        return proxy_image(asset_id, 'preview')
             
     except Exception as e:
         logger.error(f"Error in proxy_full_image for {asset_id}: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Images per batch request and the variants it can serve
+BATCH_MAX_IMAGES = 24
+BATCH_SIZES = ('thumbnail', 'preview', 'display')
+# Batch fetches and resizes get their own workers, so a large batch never
+# holds up asset details enrichment on immich_client.executor
+BATCH_WORKERS = 4
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='immich-batch')
+
+def batch_part(header, content=b''):
+    """One part of a batch response: 4-byte big-endian header length, JSON header, image bytes"""
+    header = json.dumps(header).encode('utf-8')
+    return struct.pack('>I', len(header)) + header + content
+
+@app.route('/api/proxy/batch')
+def proxy_batch():
+    """Proxy endpoint for several images in one response, e.g. a page of upcoming slides.
+
+    Takes ?ids=<id>,<id>,... and ?size=thumbnail|preview|display, plus
+    optionally ?v=<updatedAt>,... in the same order as the ids. display is
+    the image as /api/proxy/image serves it for the ?w=&h=&dpr= viewport.
+    The images are fetched concurrently and streamed in the order they become
+    ready, each as one length-prefixed part (see batch_part) whose header
+    carries id, status, content_type, length and cache.
+    """
+    if not immich_client:
+        return jsonify({'error': 'Immich not configured'}), 400
+
+    size = request.args.get('size', 'thumbnail')
+    if size not in BATCH_SIZES:
+        return jsonify({'error': f"Invalid size, use one of: {', '.join(BATCH_SIZES)}"}), 400
+    asset_ids = [asset_id for asset_id in request.args.get('ids', '').split(',') if asset_id]
+    if not asset_ids or len(asset_ids) > BATCH_MAX_IMAGES:
+        return jsonify({'error': f"Pass between 1 and {BATCH_MAX_IMAGES} ids"}), 400
+    versions = request.args.get('v', '').split(',')
+    # Pair ids with their versions before dropping duplicate ids
+    versions = dict(zip(asset_ids, versions + [''] * (len(asset_ids) - len(versions))))
+
+    def version_of(asset_id):
+        if versions[asset_id]:
+            return versions[asset_id]
+        cached = immich_client.asset_info_cache.peek(asset_id)
+        return cached.updated_at if cached is not None else None
+
+    target = requested_display_size() if size == 'display' else None
+    if target is not None:
+        fmt = image_format(request.headers.get('Accept'))
+        variant = 'resized'
+        fetch = lambda asset_id, version: get_resized_image(asset_id, target, fmt, version)[:2]
+    else:
+        # Without resizing, the display image is the preview (originals are only streamed singly)
+        variant = 'preview' if size == 'display' else size
+        fetch = lambda asset_id, version: get_cached_image(asset_id, variant, version)
+
+    futures = {
+        batch_executor.submit(fetch, asset_id, version_of(asset_id)): asset_id
+        for asset_id in versions
+    }
+
+    def generate():
+        try:
+            for future in as_completed(futures):
+                asset_id = futures[future]
+                try:
+                    image_data_obj, cache = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching {asset_id} for batch: {e}")
+                    image_data_obj, cache = None, 'miss'
+                if image_data_obj is None:
+                    yield batch_part({'id': asset_id, 'status': 404, 'content_type': None, 'length': 0, 'cache': cache})
+                    continue
+                metrics.PROXY_BYTES.inc(len(image_data_obj.content), variant=variant, cache=cache)
+                yield batch_part({
+                    'id': asset_id,
+                    'status': 200,
+                    'content_type': image_data_obj.content_type,
+                    'length': len(image_data_obj.content),
+                    'cache': cache
+                }, image_data_obj.content)
+        finally:
+            # The client went away: skip fetches that have not started yet
+            for future in futures:
+                future.cancel()
+
+    response = Response(generate(), mimetype='application/vnd.immich-kiosk.batch', direct_passthrough=True)
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Proxy-Source'] = 'immich-kiosk'
+    return response
+
+def staleness_stats():
+    """How old the data is that kiosks get while Immich is unreachable"""
+    now = datetime.utcnow()
+    with memories_cache_lock:
+        fetched_at = memories_cache['fetched_at']
+        expires_at = memories_cache['expires_at']
+        stale_served = memories_cache['stale_served']
+    last_success_at = immich_client.last_success_at
+    return {
+        'offline': immich_client.offline,
+        'last_contact': datetime.utcfromtimestamp(last_success_at).isoformat() if last_success_at else None,
+        'memories_fetched_at': fetched_at.isoformat() if fetched_at else None,
+        'memories_age_seconds': round((now - fetched_at).total_seconds()) if fetched_at else None,
+        'memories_expired': expires_at is not None and now >= expires_at,
+        'stale_memories_served': stale_served,
+        'stale_images_served': image_cache.stats()['stale_hits'] if image_cache is not None else 0,
+        'stale_metadata_served': immich_client.asset_info_cache.stats()['stale_hits']
+    }
+
 @app.route('/api/immich/status')
 def api_immich_status():
     """API endpoint to check Immich connection status"""
@@ -153,13 +735,196 @@ def api_immich_status():
         })
     
     connected = immich_client.test_connection()
+    with immich_connection_lock:
+        state = dict(immich_connection)
     return jsonify({
         'connected': connected,
+        'ready': state['ready'],
+        'connected_since': state['connected_since'],
+        'last_error': state['last_error'],
+        'circuit_breaker': immich_client.breaker.state,
+        'staleness': staleness_stats(),
         'url': config.get('immich_url', ''),
-        'has_api_key': bool(config.get('immich_api_key'))
+        'has_api_key': bool(config.get('immich_api_key')),
+        'image_cache': image_cache.stats() if image_cache is not None else None,
+        'metadata_cache': immich_client.asset_info_cache.stats(),
+        'album_index': album_index.stats() if album_index is not None else None,
+        'prefetch': prefetcher.stats() if prefetcher is not None else None,
+        'sessions': session_manager.stats() if session_manager is not None else None
     })
 
+# Filtered and enriched memories payload, valid until the next showAt/hideAt boundary.
+# The last good payload is kept on disk and served past its expiry while Immich is unreachable.
+MEMORIES_CACHE_FILE = os.path.join(DATA_DIR, 'memories_cache.json')
+memories_cache_lock = threading.Lock()
+memories_load_lock = threading.Lock()
+memories_cache = {'payload': None, 'expires_at': None, 'fetched_at': None, 'refreshing': False, 'stale_served': 0}
+
+def invalidate_memories_cache():
+    """Drop the cached memories payload"""
+    with memories_cache_lock:
+        memories_cache['payload'] = None
+        memories_cache['expires_at'] = None
+        memories_cache['fetched_at'] = None
+    try:
+        os.remove(MEMORIES_CACHE_FILE)
+    except OSError:
+        pass
+
+def save_memories_cache():
+    """Write the memories payload to disk, so it survives a restart during an outage"""
+    with memories_cache_lock:
+        if memories_cache['payload'] is None:
+            return
+        saved = {
+            'payload': memories_cache['payload'],
+            'expires_at': memories_cache['expires_at'].isoformat(),
+            'fetched_at': memories_cache['fetched_at'].isoformat()
+        }
+    try:
+        tmp_path = f"{MEMORIES_CACHE_FILE}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(saved, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, MEMORIES_CACHE_FILE)
+    except OSError as e:
+        logger.warning(f"Failed to save memories cache: {e}")
+
+def load_memories_cache():
+    """Restore the memories payload saved by a previous run"""
+    try:
+        with open(MEMORIES_CACHE_FILE) as f:
+            saved = json.load(f)
+        payload = (saved['payload'][0], saved['payload'][1])
+        expires_at = datetime.fromisoformat(saved['expires_at'])
+        fetched_at = datetime.fromisoformat(saved['fetched_at'])
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable memories cache: {e}")
+        return
+    with memories_cache_lock:
+        memories_cache.update(payload=payload, expires_at=expires_at, fetched_at=fetched_at)
+    logger.info(f"Loaded {len(payload[0])} cached memory photos from {fetched_at.isoformat()}")
+
+def load_memories(current_time):
+    """Fetch memories active at current_time and enrich their photos.
+
+    Returns the processed photos, the total number of memories and the time of
+    the earliest upcoming showAt/hideAt, i.e. when the active set next changes;
+    None if Immich could not be asked.
+    """
+    memories = immich_client.get_memories()
+    if memories is None:
+        return None
+    
+    # Filter memories that should be shown today
+    today_memories = []
+    next_boundary = None
+    for memory in memories:
+        show_at = memory.show_at
+        hide_at = memory.hide_at
+        
+        # Parse timestamps
+        try:
+            if show_at:
+                show_time = datetime.fromisoformat(show_at.replace('Z', '+00:00')).replace(tzinfo=None)
+            else:
+                continue  # Skip if no showAt time
+                
+            if hide_at:
+                hide_time = datetime.fromisoformat(hide_at.replace('Z', '+00:00')).replace(tzinfo=None)
+            else:
+                continue  # Skip if no hideAt time
+            
+            for boundary in (show_time, hide_time):
+                if boundary > current_time and (next_boundary is None or boundary < next_boundary):
+                    next_boundary = boundary
+            
+            # Check if memory should be shown today
+            if show_time <= current_time <= hide_time:
+                today_memories.append(memory)
+                logger.debug(f"Memory {memory.id} is active for today (show: {show_time}, hide: {hide_time}, now: {current_time})")
+            else:
+                logger.debug(f"Memory {memory.id} is not active for today (show: {show_time}, hide: {hide_time}, now: {current_time})")
+                
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Failed to parse timestamps for memory {memory.id}: {e}")
+            continue
+    
+    logger.info(f"Found {len(today_memories)} memories for today out of {len(memories)} total memories")
+    
+    # Collect displayable assets from active memories
+    memory_assets = []
+    for memory in today_memories:
+        if memory.assets:
+            for asset in memory.assets:
+                if asset.is_archived or asset.type != 'IMAGE':
+                    logger.debug(f"Skipping asset {asset.id} in memory {memory.id}")
+                    continue
+                memory_assets.append(asset)
+    
+    # Process memories to include URLs and metadata, including author and location
+    return serialize_assets(memory_assets), len(memories), next_boundary
+
+def get_memories_payload(current_time, refresh=False):
+    """Get the memories payload from cache, reloading it once the active set may have changed.
+
+    Returns (payload, expires_at, cached). An expired payload is served at once
+    and reloaded in the background; while Immich is unreachable it is served
+    as is, however old.
+    """
+    with memories_cache_lock:
+        payload = memories_cache['payload']
+        expires_at = memories_cache['expires_at']
+        if not refresh and payload is not None:
+            if current_time >= expires_at:
+                memories_cache['stale_served'] += 1
+                if not immich_client.offline and not memories_cache['refreshing']:
+                    memories_cache['refreshing'] = True
+                    threading.Thread(target=refresh_memories, args=(datetime.utcnow(),),
+                                     name='memories-refresh', daemon=True).start()
+            return payload, expires_at, True
+    return refresh_memories(current_time, refresh)
+
+def refresh_memories(current_time, refresh=True):
+    """Load memories from Immich into the cache; falls back to the cached payload if that fails"""
+    with memories_load_lock:
+        try:
+            with memories_cache_lock:
+                payload = memories_cache['payload']
+                expires_at = memories_cache['expires_at']
+                if not refresh and payload is not None and current_time < expires_at:
+                    # Loaded by a concurrent request meanwhile
+                    return payload, expires_at, True
+            loaded = load_memories(current_time)
+        finally:
+            with memories_cache_lock:
+                memories_cache['refreshing'] = False
+
+        if loaded is None:
+            if payload is not None:
+                logger.warning("Could not load memories from Immich, serving the last good ones")
+                with memories_cache_lock:
+                    memories_cache['stale_served'] += 1
+                return payload, expires_at, True
+            # Nothing to fall back to; not cached, so the next request tries again
+            return ([], 0), current_time, False
+
+        processed_memories, total_memories, next_boundary = loaded
+        # Memories created in Immich meanwhile would otherwise stay hidden until the boundary
+        expires_at = current_time + timedelta(seconds=config.get('memories_cache_max_age', 21600))
+        if next_boundary is not None and next_boundary < expires_at:
+            expires_at = next_boundary
+        payload = (processed_memories, total_memories)
+        with memories_cache_lock:
+            memories_cache.update(payload=payload, expires_at=expires_at, fetched_at=datetime.utcnow())
+        save_memories_cache()
+        return payload, expires_at, False
+
 @app.route('/api/memories')
+@profile_if_requested
 def api_memories():
     """API endpoint to get memories for today from Immich"""
     if not immich_client:
@@ -177,75 +942,21 @@ def api_memories():
         }), 400
     
     try:
-        memories = immich_client.get_memories()
-        
         # Get current time in UTC
         current_time = datetime.utcnow()
         
-        # Filter memories that should be shown today
-        today_memories = []
-        for memory in memories:
-            show_at = memory.show_at
-            hide_at = memory.hide_at
-            
-            # Parse timestamps
-            try:
-                if show_at:
-                    show_time = datetime.fromisoformat(show_at.replace('Z', '+00:00')).replace(tzinfo=None)
-                else:
-                    continue  # Skip if no showAt time
-                    
-                if hide_at:
-                    hide_time = datetime.fromisoformat(hide_at.replace('Z', '+00:00')).replace(tzinfo=None)
-                else:
-                    continue  # Skip if no hideAt time
-                
-                # Check if memory should be shown today
-                if show_time <= current_time <= hide_time:
-                    today_memories.append(memory)
-                    logger.debug(f"Memory {memory.id} is active for today (show: {show_time}, hide: {hide_time}, now: {current_time})")
-                else:
-                    logger.debug(f"Memory {memory.id} is not active for today (show: {show_time}, hide: {hide_time}, now: {current_time})")
-                    
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Failed to parse timestamps for memory {memory.id}: {e}")
-                continue
-        
-        logger.info(f"Found {len(today_memories)} memories for today out of {len(memories)} total memories")
-        
-        # Process memories to include URLs and metadata, including author and location
-        processed_memories = []
-        for memory in today_memories:
-            if memory.assets:
-                for asset in memory.assets:
-                    if asset.is_archived or asset.type != 'IMAGE':
-                        logger.debug(f"Skipping asset {asset.id} in memory {memory.id}")
-                        continue
-                    # Get asset details from API (for author/location)
-                    asset_info = immich_client.get_asset_info(asset.id)
-                    asset_data = {
-                        'id': asset.id,
-                        'type': asset.type,
-                        'original_filename': asset.original_filename,
-                        'file_created_at': asset.file_created_at,
-                        'file_modified_at': asset.file_modified_at,
-                        'updated_at': asset.updated_at,
-                        'is_favorite': asset.is_favorite,
-                        'thumbnail_url': f"/api/proxy/thumbnail/{asset.id}",
-                        'full_image_url': f"/api/proxy/image/{asset.id}",
-                        'author': asset_info.author if asset_info else None,
-                        'city': asset_info.city if asset_info else None,
-                        'state': asset_info.state if asset_info else None,
-                        'country': asset_info.country if asset_info else None
-                    }
-                    processed_memories.append(asset_data)
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        (processed_memories, total_memories), expires_at, cached = get_memories_payload(current_time, refresh)
         
         return jsonify({
             'success': True,
             'memories': processed_memories,
             'count': len(processed_memories),
-            'total_memories': len(memories),
+            'total_memories': total_memories,
             'current_time': current_time.isoformat(),
+            'cached': cached,
+            'stale': current_time >= expires_at,
+            'expires_at': expires_at.isoformat()
         })
         
     except Exception as e:
@@ -256,7 +967,14 @@ def api_memories():
             'memories': []
         }), 500
 
+@app.route('/api/memories/invalidate', methods=['POST'])
+def api_memories_invalidate():
+    """API endpoint to drop the cached memories, e.g. after editing memories in Immich"""
+    invalidate_memories_cache()
+    return jsonify({'success': True})
+
 @app.route('/api/randomPhotos')
+@profile_if_requested
 def api_random_photos():
     """API endpoint to get random photos from configured albums"""
     if not immich_client:
@@ -282,30 +1000,19 @@ def api_random_photos():
         }), 400
     
     try:
-        # Get random photos from configured albums
-        random_photos = immich_client.get_random_photos_from_albums(album_names, count=50)
+        # Get random photos from configured albums: one search request on servers
+        # that support it, otherwise sampled from the local album index
+        random_photos = None
+        if album_index is not None:
+            album_index.sync(album_names)
+            random_photos = immich_client.search_random_assets(album_index.get_albums(album_names), count=50)
+            if random_photos is None:
+                random_photos = album_index.get_random_photos(album_names, count=50)
+        else:
+            random_photos = immich_client.get_random_photos_from_albums(album_names, count=50)
         
         # Process photos to include URLs and metadata, including author and location
-        processed_photos = []
-        for photo in random_photos:
-            # Get asset details from API (for author/location)
-            asset_info = immich_client.get_asset_info(photo.id)
-            photo_data = {
-                'id': photo.id,
-                'type': photo.type,
-                'original_filename': photo.original_filename,
-                'file_created_at': photo.file_created_at,
-                'file_modified_at': photo.file_modified_at,
-                'updated_at': photo.updated_at,
-                'is_favorite': photo.is_favorite,
-                'thumbnail_url': f"/api/proxy/thumbnail/{photo.id}",
-                'full_image_url': f"/api/proxy/image/{photo.id}",
-                'author': asset_info.author if asset_info else None,
-                'city': asset_info.city if asset_info else None,
-                'state': asset_info.state if asset_info else None,
-                'country': asset_info.country if asset_info else None
-            }
-            processed_photos.append(photo_data)
+        processed_photos = serialize_assets(random_photos)
         
         return jsonify({
             'success': True,
@@ -322,18 +1029,339 @@ def api_random_photos():
             'error': str(e),
             'photos': []
         }), 500
+
+
+@app.route('/api/playlist')
+def api_playlist():
+    """API endpoint to page through a kiosk's shuffled no-repeat playlist of album photos"""
+    if not immich_client or playlist_store is None:
+        return jsonify({
+            'success': False,
+            'error': 'Immich not configured or connection failed',
+            'photos': []
+        }), 400
+    
+    if not config.get('immich_show_albums', True):
+        return jsonify({
+            'success': False,
+            'error': 'Albums are disabled in configuration',
+            'photos': []
+        }), 400
+    
+    album_names = config.get('immich_albums', [])
+    if not album_names:
+        return jsonify({
+            'success': False,
+            'error': 'No albums configured to display',
+            'photos': []
+        }), 400
+    
+    kiosk_id = request.args.get('kiosk', 'default')[:64]
+    cursor = request.args.get('cursor')
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid limit',
+            'photos': []
+        }), 400
+    
+    try:
+        page = playlist_store.get_page(kiosk_id, album_names, cursor=cursor, limit=limit)
+        processed_photos = serialize_assets(page.assets)
         
+        return jsonify({
+            'success': True,
+            'photos': processed_photos,
+            'count': len(processed_photos),
+            'cursor': f"{page.generation}.{page.position}",
+            'next_cursor': page.next_cursor,
+            'generation': page.generation,
+            'position': page.position,
+            'total': page.total
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in api_playlist: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'photos': []
+        }), 500
+
+@app.route('/api/prefetch', methods=['POST'])
+def api_prefetch():
+    """API endpoint where a kiosk announces its upcoming slides for background prefetching"""
+    if prefetcher is None:
+        return jsonify({'success': False, 'error': 'Prefetching is disabled'}), 400
+    
+    payload = request.get_json(silent=True) or {}
+    items = payload.get('items')
+    if not isinstance(items, list):
+        return jsonify({'success': False, 'error': 'Missing items'}), 400
+    
+    # The kiosk's viewport and the image types it decodes, so the exact variant it will request is warmed
+    viewport = payload.get('viewport')
+    size = display_size(viewport.get('w'), viewport.get('h'), viewport.get('dpr')) if isinstance(viewport, dict) else None
+    fmt = image_format(str(payload.get('accept') or ''))
+    prefetch_items = [
+        PrefetchItem(
+            asset_id=str(item['id']),
+            version=item.get('updated_at'),
+            size=size,
+            fmt=fmt,
+            placeholder=bool(item.get('thumbhash'))
+        )
+        for item in items
+        if isinstance(item, dict) and item.get('id')
+    ]
+    prefetcher.schedule(
+        kiosk_id=str(payload.get('kiosk', 'default'))[:64],
+        collection=str(payload.get('collection', '')),
+        items=prefetch_items
+    )
+    return jsonify({'success': True, 'scheduled': min(len(prefetch_items), prefetcher.depth)})
 
+# Shared sessions: screens opened with ?session=<name> show the same server-driven slideshow
+SESSION_KEEPALIVE = 15
 
+def load_session_slides(name, collection, cursor):
+    """Slides of a shared session: a page of its own playlist, or all active memories"""
+    if collection == 'random':
+        if playlist_store is None or not config.get('immich_show_albums', True):
+            return [], None
+        page = playlist_store.get_page(f"session:{name}", config.get('immich_albums', []), cursor=cursor, limit=20)
+        return serialize_assets(page.assets), page.next_cursor
+    if not config.get('immich_show_memories', True):
+        return [], None
+    (processed_memories, _total), _expires_at, _cached = get_memories_payload(datetime.utcnow())
+    return processed_memories, None
+
+def prefetch_session_slides(name, collection, upcoming):
+    """Warm the cache for a session's next slides, once for all of its screens"""
+    if prefetcher is not None:
+        prefetcher.schedule(
+            kiosk_id=f"session:{name}",
+            collection=collection,
+            items=[
+                PrefetchItem(asset_id=slide['id'], version=slide.get('updated_at'), placeholder=bool(slide.get('thumbhash')))
+                for slide in upcoming
+            ]
+        )
+
+def forget_session(name):
+    """Drop the playlist of a session that was evicted for having no screens"""
+    if playlist_store is not None:
+        playlist_store.delete(f"session:{name}")
 
+session_manager = None
+if immich_client and config.get('session_max_screens', 8) > 0:
+    session_manager = SessionManager(
+        load_slides=load_session_slides,
+        on_change=prefetch_session_slides,
+        on_evict=forget_session,
+        interval=config.get('session_interval', 8),
+        max_screens=config.get('session_max_screens', 8)
+    )
+
+@app.route('/api/session/<name>/events')
+def api_session_events(name):
+    """Server-Sent Events stream of a shared session's slide changes"""
+    if session_manager is None:
+        return jsonify({'success': False, 'error': 'Shared sessions are disabled'}), 400
+    
+    name = name[:64]
+    try:
+        subscription = session_manager.subscribe(name)
+    except SessionFullError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    def generate():
+        # Runs until the screen disconnects (noticed on the next write) or the server stops
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = subscription.get(timeout=SESSION_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    return
+                yield f"event: slide\ndata: {json.dumps(event)}\n\n"
+        finally:
+            session_manager.unsubscribe(name, subscription)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/session/<name>/control', methods=['POST'])
+def api_session_control(name):
+    """API endpoint where a screen moves its shared session: next, prev or collection"""
+    if session_manager is None:
+        return jsonify({'success': False, 'error': 'Shared sessions are disabled'}), 400
+    
+    payload = request.get_json(silent=True) or {}
+    try:
+        event = session_manager.control(name[:64], str(payload.get('action', '')), payload.get('collection'))
+    except SessionNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'event': event})
+
+
+# Immich connection, established and watched in the background so startup never waits for Immich
+IMMICH_CHECK_INTERVAL = 60
+IMMICH_RETRY_MIN = 2
+IMMICH_RETRY_MAX = 60
+# Changed asset details are written to disk at most this often (and on shutdown), sparing SD cards
+ASSET_INFO_SAVE_INTERVAL = 600
+immich_connection_lock = threading.Lock()
+immich_connection = {'connected': False, 'ready': False, 'connected_since': None, 'last_check': None, 'last_error': None}
+immich_watcher_stop = threading.Event()
+
+def warm_caches():
+    """Sync the album index and load memories, so the first kiosk requests are fast"""
+    album_names = config.get('immich_albums', [])
+    if album_index is not None and config.get('immich_show_albums', True) and album_names:
+        # Immich just (re)connected, so the index may be stale whatever the interval says
+        album_index.sync(album_names, force=True)
+    if config.get('immich_show_memories', True):
+        get_memories_payload(datetime.utcnow())
+
+def save_asset_info_cache():
+    """Persist asset details, so they can be served after a restart while Immich is down"""
+    try:
+        immich_client.asset_info_cache.save(os.path.join(DATA_DIR, 'asset_info_cache.json'))
+    except OSError as e:
+        logger.warning(f"Failed to save asset details cache: {e}")
+
+def watch_immich_connection():
+    """Connect to Immich, warm caches once connected, and keep checking; retries with backoff while down.
+
+    While Immich is unreachable the client is switched offline, so requests are
+    answered from the last good data at once instead of waiting for timeouts.
+    """
+    retry_delay = IMMICH_RETRY_MIN
+    last_save = time.monotonic()
+    while not immich_watcher_stop.is_set():
+        connected = immich_client.test_connection()
+        immich_client.offline = not connected
+        now = datetime.utcnow().isoformat()
+        with immich_connection_lock:
+            was_connected = immich_connection['connected']
+            immich_connection['connected'] = connected
+            immich_connection['last_check'] = now
+            if not connected:
+                immich_connection['ready'] = False
+                immich_connection['connected_since'] = None
+                immich_connection['last_error'] = f"Immich at {config.get('immich_url')} is not reachable"
+
+        if connected and not was_connected:
+            logger.info("Successfully connected to Immich server, warming caches")
+            try:
+                warm_caches()
+            except Exception as e:
+                logger.error(f"Failed to warm caches: {e}")
+            with immich_connection_lock:
+                immich_connection['ready'] = True
+                immich_connection['connected_since'] = now
+                immich_connection['last_error'] = None
+        elif not connected:
+            if was_connected:
+                logger.warning("Lost connection to Immich server, reconnecting in the background")
+            else:
+                logger.warning(f"Failed to connect to Immich server, retrying in {retry_delay} s")
+
+        if connected:
+            if time.monotonic() - last_save >= ASSET_INFO_SAVE_INTERVAL:
+                save_asset_info_cache()
+                last_save = time.monotonic()
+            delay, retry_delay = IMMICH_CHECK_INTERVAL, IMMICH_RETRY_MIN
+        else:
+            delay, retry_delay = retry_delay, min(retry_delay * 2, IMMICH_RETRY_MAX)
+        immich_watcher_stop.wait(delay)
+
+def stop_background_workers():
+    """Stop background threads before the process exits"""
+    immich_watcher_stop.set()
+    if session_manager is not None:
+        session_manager.stop()
+    if prefetcher is not None:
+        prefetcher.stop()
+    if immich_client is not None:
+        immich_client.executor.shutdown(wait=False, cancel_futures=True)
+        save_asset_info_cache()
+    batch_executor.shutdown(wait=False, cancel_futures=True)
+
+def run_server(host='0.0.0.0', port=8456):
+    """Serve the app with waitress: a pool of worker threads, HTTP keep-alive and graceful shutdown"""
+    try:
+        from waitress import create_server
+    except ImportError:
+        logger.warning("waitress is not installed, falling back to the threaded Flask development server")
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+
+    threads = config.get('server_threads', 8)
+    if session_manager is not None:
+        # Every session screen holds a worker for its event stream
+        threads += session_manager.max_screens
+    server = create_server(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        channel_timeout=config.get('server_keepalive_timeout', 120),
+        ident='immich-kiosk'
+    )
+
+    shutdown = {'started': False, 'drained': False}
+
+    def handle_shutdown(signum, frame):
+        if shutdown['drained']:
+            # Raised in the main thread by drain() below; waitress exits its loop on SystemExit
+            raise SystemExit(0)
+        if shutdown['started']:
+            return
+        shutdown['started'] = True
+        logger.info(f"Received signal {signum}, finishing in-flight requests...")
+        # Stop accepting new connections but keep the I/O loop running, so
+        # workers can still flush their responses while we wait for them
+        server.accepting = False
+
+        def drain():
+            if session_manager is not None:
+                # End event streams first, they would otherwise keep their workers busy
+                session_manager.stop()
+            # shutdown() reports success even when it gives up waiting, so
+            # look at the workers still registered with the dispatcher
+            server.task_dispatcher.shutdown(timeout=config.get('server_shutdown_timeout', 10))
+            if server.task_dispatcher.threads:
+                logger.warning(f"Timed out waiting for in-flight requests, {len(server.task_dispatcher.threads)} still running")
+            stop_background_workers()
+            shutdown['drained'] = True
+            _thread.interrupt_main(signal.SIGINT)
+
+        threading.Thread(target=drain, name='shutdown', daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle_shutdown)
+    signal.signal(signal.SIGINT, handle_shutdown)
+
+    logger.info(f"Serving on http://{host}:{port} with {threads} worker threads")
+    server.run()
+    logger.info("Immich Kiosk Gallery stopped")
+
+if immich_client:
+    load_memories_cache()
+    threading.Thread(target=watch_immich_connection, name='immich-connect', daemon=True).start()
 
 if __name__ == '__main__':
     logger.info("Starting Immich Kiosk Gallery...")
     logger.info(f"Configuration: {config}")
     
-    # Run the Flask app
-    app.run(
-        host='0.0.0.0',
-        port=8456,
-        debug=False
-    )
+    run_server(port=int(os.environ.get('IMMICH_KIOSK_PORT', 8456)))
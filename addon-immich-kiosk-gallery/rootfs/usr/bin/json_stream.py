@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+JSON Stream - Incremental decoding of large JSON arrays, one item at a time
+"""
+
+import json
+import codecs
+from typing import Any, Iterable, Iterator, Optional
+
+# Bytes read from the response at a time
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# Characters that can continue a number; one of them right after a decoded value means the number was cut
+_NUMBER_CHARS = '0123456789.eE+-'
+
+class _Reader:
+    """Text buffer over an iterable of UTF-8 byte chunks.
+
+    Only the unconsumed tail of the input is kept, so memory is bounded by the
+    chunk size plus the largest single value decoded.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk to the buffer; False once the input is exhausted"""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer = self.buffer[self.pos:] + self._utf8.decode(chunk)
+                self.pos = 0
+                return True
+        self.buffer = self.buffer[self.pos:] + self._utf8.decode(b'', final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it; '' at the end of the input"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed JSON: expected {char!r}, found {found or 'end of input'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value"""
+        while True:
+            self.peek()
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if not self.eof and (end == len(self.buffer) or self.buffer[end] in _NUMBER_CHARS):
+                # A number cut at the chunk boundary ('1.' of '1.5') decodes too early
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+def iter_array(chunks: Iterable[bytes], key: Optional[str] = None) -> Iterator[Any]:
+    """Yield the items of a JSON array as they are decoded.
+
+    Without key the input must be a top-level array; with key, the array is
+    the value of that key in a top-level object, and the object's other values
+    are decoded and dropped on the way. Nothing is yielded if the key is
+    missing. Raises ValueError (json.JSONDecodeError) on malformed input.
+    """
+    reader = _Reader(chunks)
+    if key is not None:
+        reader.expect('{')
+        while True:
+            if reader.peek() == '}':
+                return
+            name = reader.value()
+            reader.expect(':')
+            if name == key:
+                break
+            reader.value()
+            if reader.peek() == ',':
+                reader.pos += 1
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.value()
+        separator = reader.peek()
+        if separator == ']':
+            return
+        reader.expect(',')
+
+def iter_response_array(response, key: Optional[str] = None) -> Iterator[Any]:
+    """iter_array over a streamed requests response, closing it when done"""
+    try:
+        yield from iter_array(response.iter_content(chunk_size=CHUNK_SIZE), key)
+    finally:
+        response.close()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Metrics - Thread-safe counters, gauges and histograms in the Prometheus text format
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers cache hits (sub-millisecond) up to slow originals over a bad link
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Iterable[str], values: Iterable, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base of all metrics: a name, help text and a fixed set of label names"""
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class _ValueMetric(Metric):
+    """Single value per label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+class Counter(_ValueMetric):
+    """Monotonically increasing value per label set"""
+    type = 'counter'
+
+class Gauge(_ValueMetric):
+    """Value per label set that can go up and down"""
+    type = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets per label set"""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(state[-2]))}")
+            lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+class CallbackMetric(Metric):
+    """Metric whose values are read from a callback at scrape time.
+
+    The callback returns a list of (labels dict, value) pairs; used to expose
+    counters that components already keep, like cache hits and misses.
+    """
+
+    def __init__(self, name: str, documentation: str, metric_type: str, labelnames: Tuple[str, ...],
+                 callback: Callable[[], List[Tuple[Dict[str, str], Optional[float]]]]):
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}"
+            for labels, value in self.callback()
+            if value is not None
+        ]
+
+class Registry:
+    """Collection of metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, metric_type: str, labelnames: Tuple[str, ...],
+                 callback) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, metric_type, labelnames, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+REGISTRY = Registry()
+
+# Upstream Immich calls, recorded by ImmichAPIClient
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'immich_kiosk_upstream_request_duration_seconds',
+    'Time until Immich answered, per attempt (headers only for streamed responses)',
+    ('method', 'endpoint')
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'immich_kiosk_upstream_errors_total',
+    'Failed Immich calls by reason: HTTP status, timeout, connection, circuit_open or offline',
+    ('method', 'endpoint', 'reason')
+)
+ENRICHMENT_DURATION = REGISTRY.histogram(
+    'immich_kiosk_enrichment_duration_seconds',
+    'Time to add author and location to a batch of assets: per_asset lookups or inline EXIF from search/memories',
+    ('source',)
+)
+ENRICHMENT_ASSETS = REGISTRY.counter(
+    'immich_kiosk_enriched_assets_total',
+    'Assets enriched, by where the details came from: cache, lookup (one call per asset), inline or stale',
+    ('source',)
+)
+COALESCED_REQUESTS = REGISTRY.counter(
+    'immich_kiosk_coalesced_requests_total',
+    'Requests that joined an identical in-flight fetch instead of calling Immich',
+    ('kind',)
+)
+
+# Requests served by the kiosk, recorded by immich_kiosk
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'immich_kiosk_http_requests_in_flight',
+    'Requests currently being handled by the kiosk'
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    'immich_kiosk_http_request_duration_seconds',
+    'Time to build a kiosk response (until the body starts streaming)',
+    ('endpoint', 'status')
+)
+PROXY_BYTES = REGISTRY.counter(
+    'immich_kiosk_proxy_bytes_served_total',
+    'Image bytes sent to kiosk browsers',
+    ('variant', 'cache')
+)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Playlist - Persistent no-repeat shuffle of the album photo pool per kiosk
+"""
+
+import time
+import random
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+from album_index import AlbumIndex
+from immich_api_client import Asset
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Playlists of kiosks not seen for this long are deleted
+PLAYLIST_MAX_IDLE = 30 * 24 * 3600
+# How often get_page looks for such playlists
+SWEEP_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    kiosk_id TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    created_at REAL,
+    position INTEGER NOT NULL DEFAULT 0,
+    used_at REAL
+);
+CREATE TABLE IF NOT EXISTS playlist_items (
+    kiosk_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    asset_id TEXT NOT NULL,
+    PRIMARY KEY (kiosk_id, position)
+);
+"""
+
+@dataclass
+class PlaylistPage:
+    """Represents one page of a kiosk playlist"""
+    assets: List[Asset]
+    next_cursor: str
+    generation: int
+    position: int
+    total: int
+
+class PlaylistStore:
+    """Shuffled permutations of the album pool, one per kiosk.
+
+    Each kiosk walks its permutation page by page, so every photo is shown once
+    before any repeats. The permutation is reshuffled when the pool changes
+    (an album was re-indexed) or when the kiosk reaches its end. Cursors have
+    the form '<generation>.<position>'. The position of every kiosk is also
+    stored, so a request without a cursor, or with one from an older
+    generation, resumes where the kiosk left off (after a page reload or a
+    restart). Playlists unused for max_idle seconds are deleted.
+    """
+
+    def __init__(self, db_path: str, album_index: AlbumIndex, max_idle: float = PLAYLIST_MAX_IDLE):
+        self.album_index = album_index
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Bring playlists created by an older version up to the current schema"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(playlists)')}
+        if 'position' not in columns:
+            self._conn.execute('ALTER TABLE playlists ADD COLUMN position INTEGER NOT NULL DEFAULT 0')
+        if 'used_at' not in columns:
+            self._conn.execute('ALTER TABLE playlists ADD COLUMN used_at REAL')
+            self._conn.execute('UPDATE playlists SET used_at = created_at')
+
+    @staticmethod
+    def parse_cursor(cursor: Optional[str]):
+        """Parse a cursor into (generation, position); invalid cursors start over"""
+        if not cursor:
+            return None, 0
+        try:
+            generation, position = cursor.split('.', 1)
+            return int(generation), max(0, int(position))
+        except ValueError:
+            logger.debug(f"Ignoring invalid playlist cursor: {cursor}")
+            return None, 0
+
+    def _shuffle(self, kiosk_id: str, signature: str, generation: int, album_names: List[str]) -> int:
+        """Write a fresh permutation of the pool for a kiosk. Caller holds the lock."""
+        asset_ids = self.album_index.get_pool_ids(album_names)
+        random.shuffle(asset_ids)
+        with self._conn:
+            self._conn.execute('DELETE FROM playlist_items WHERE kiosk_id = ?', (kiosk_id,))
+            self._conn.executemany(
+                'INSERT INTO playlist_items (kiosk_id, position, asset_id) VALUES (?, ?, ?)',
+                [(kiosk_id, position, asset_id) for position, asset_id in enumerate(asset_ids)]
+            )
+            now = time.time()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO playlists (kiosk_id, signature, generation, length, created_at, position, used_at) '
+                'VALUES (?, ?, ?, ?, ?, 0, ?)',
+                (kiosk_id, signature, generation, len(asset_ids), now, now)
+            )
+        logger.info(f"Shuffled playlist for kiosk '{kiosk_id}' (generation {generation}, {len(asset_ids)} photos)")
+        return len(asset_ids)
+
+    def get_page(self, kiosk_id: str, album_names: List[str], cursor: Optional[str] = None, limit: int = 20) -> PlaylistPage:
+        """Get the next page of a kiosk's playlist"""
+        try:
+            self.album_index.sync(album_names)
+        except Exception as e:
+            logger.error(f"Error syncing album index, using existing index for playlist: {e}")
+
+        signature = self.album_index.pool_signature(album_names)
+        cursor_generation, position = self.parse_cursor(cursor)
+
+        with self._lock:
+            self._sweep()
+            row = self._conn.execute(
+                'SELECT signature, generation, length, position FROM playlists WHERE kiosk_id = ?',
+                (kiosk_id,)
+            ).fetchone()
+
+            if row is None or row[0] != signature:
+                generation = row[1] + 1 if row else 1
+                length = self._shuffle(kiosk_id, signature, generation, album_names)
+                position = 0
+            else:
+                _signature, generation, length, stored_position = row
+                if cursor_generation != generation:
+                    # No usable cursor (page reload, restart): resume where the kiosk left off
+                    position = stored_position
+                if position >= length:
+                    # Every photo was shown once; start a new round in a new order
+                    generation += 1
+                    length = self._shuffle(kiosk_id, signature, generation, album_names)
+                    position = 0
+
+            asset_ids = [
+                row[0] for row in self._conn.execute(
+                    'SELECT asset_id FROM playlist_items WHERE kiosk_id = ? AND position >= ? '
+                    'ORDER BY position LIMIT ?',
+                    (kiosk_id, position, limit)
+                )
+            ]
+            next_position = position + len(asset_ids)
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE playlists SET position = ?, used_at = ? WHERE kiosk_id = ?',
+                    (next_position, time.time(), kiosk_id)
+                )
+
+        return PlaylistPage(
+            assets=self.album_index.get_assets(asset_ids),
+            next_cursor=f"{generation}.{next_position}",
+            generation=generation,
+            position=position,
+            total=length
+        )
+
+    def _sweep(self):
+        """Delete playlists of kiosks not seen for max_idle, at most every SWEEP_INTERVAL. Caller holds the lock."""
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        cutoff = now - self.max_idle
+        with self._conn:
+            stale = [
+                row[0] for row in self._conn.execute(
+                    'SELECT kiosk_id FROM playlists WHERE COALESCE(used_at, created_at, 0) < ?', (cutoff,)
+                )
+            ]
+            for kiosk_id in stale:
+                self._conn.execute('DELETE FROM playlist_items WHERE kiosk_id = ?', (kiosk_id,))
+                self._conn.execute('DELETE FROM playlists WHERE kiosk_id = ?', (kiosk_id,))
+        if stale:
+            logger.info(f"Deleted {len(stale)} playlists unused for {self.max_idle / 86400:.0f} days")
+
+    def delete(self, kiosk_id: str):
+        """Forget a kiosk's playlist"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM playlist_items WHERE kiosk_id = ?', (kiosk_id,))
+            self._conn.execute('DELETE FROM playlists WHERE kiosk_id = ?', (kiosk_id,))
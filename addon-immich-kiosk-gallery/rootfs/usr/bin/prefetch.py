@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Prefetch - Background warming of the image cache for upcoming slides
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PrefetchItem:
+    """Represents one upcoming slide to warm"""
+    asset_id: str
+    version: Optional[str] = None
+    # Display size and format the kiosk will request the image in; None warms the plain preview
+    size: Optional[Tuple[int, int]] = None
+    fmt: str = 'jpeg'
+    # The kiosk paints the thumbhash placeholder, so the thumbnail is not needed
+    placeholder: bool = False
+
+@dataclass
+class PrefetchJob:
+    """Upcoming slides of one kiosk"""
+    kiosk_id: str
+    collection: str
+    items: List[PrefetchItem]
+    generation: int
+
+class Prefetcher:
+    """Background worker that warms caches for the next slides of each kiosk.
+
+    Every kiosk has at most one pending job. Scheduling a new job for a kiosk
+    replaces its previous one, so a collection switch cancels prefetching of
+    the old collection even mid-job. Fetches are rate limited globally so
+    warming never competes too hard with on-screen requests.
+    """
+
+    def __init__(self, prefetch_asset: Callable[[PrefetchItem], None], depth: int = 5, rate: float = 4.0):
+        self.prefetch_asset = prefetch_asset
+        self.depth = depth
+        self.min_interval = 1.0 / rate if rate > 0 else 0.0
+        self.prefetched = 0
+        self.cancelled = 0
+        self._jobs: Dict[str, PrefetchJob] = {}
+        self._generation = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._last_fetch = 0.0
+        self._thread = threading.Thread(target=self._run, name='immich-prefetch', daemon=True)
+        self._thread.start()
+
+    def schedule(self, kiosk_id: str, collection: str, items: List[PrefetchItem]):
+        """Replace the pending job of a kiosk with its next slides"""
+        with self._condition:
+            previous = self._jobs.get(kiosk_id)
+            if previous is not None and previous.items and previous.collection != collection:
+                self.cancelled += 1
+                logger.debug(f"Cancelled prefetch of '{previous.collection}' for kiosk '{kiosk_id}'")
+            self._generation += 1
+            self._jobs[kiosk_id] = PrefetchJob(
+                kiosk_id=kiosk_id,
+                collection=collection,
+                items=list(items[:self.depth]),
+                generation=self._generation
+            )
+            self._condition.notify()
+
+    def stop(self):
+        """Stop the worker thread"""
+        with self._condition:
+            self._stopped = True
+            self._jobs.clear()
+            self._condition.notify()
+        self._thread.join(timeout=5)
+
+    def _next_item(self):
+        """Pop the next item of the oldest job with work left. Caller holds the condition."""
+        for job in sorted(self._jobs.values(), key=lambda job: job.generation):
+            if job.items:
+                return job.kiosk_id, job.generation, job.items.pop(0)
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                next_item = self._next_item()
+                while next_item is None and not self._stopped:
+                    self._condition.wait()
+                    next_item = self._next_item()
+                if self._stopped:
+                    return
+
+                # Rate limit, giving up the slot if the job is replaced meanwhile.
+                # Any schedule() wakes the wait early, so the delay is recomputed.
+                kiosk_id, generation, item = next_item
+                replaced = False
+                delay = self._last_fetch + self.min_interval - time.monotonic()
+                while delay > 0:
+                    self._condition.wait(delay)
+                    job = self._jobs.get(kiosk_id)
+                    if self._stopped or job is None or job.generation != generation:
+                        replaced = True
+                        break
+                    delay = self._last_fetch + self.min_interval - time.monotonic()
+                if replaced:
+                    continue
+                self._last_fetch = time.monotonic()
+
+            try:
+                self.prefetch_asset(item)
+                self.prefetched += 1
+            except Exception as e:
+                logger.warning(f"Prefetch of {item.asset_id} failed: {e}")
+
+    def stats(self):
+        """Return prefetcher statistics"""
+        with self._condition:
+            pending = sum(len(job.items) for job in self._jobs.values())
+        return {
+            'depth': self.depth,
+            'pending': pending,
+            'prefetched': self.prefetched,
+            'cancelled': self.cancelled
+        }
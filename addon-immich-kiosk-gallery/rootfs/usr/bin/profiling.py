@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Profiling - cProfile reports of single requests, broken down by where the time went
+
+Which threads show up depends on the Python version. Up to 3.11, cProfile
+follows only the thread that enabled it. Python 3.12 (the add-on image)
+implements it on sys.monitoring, which is process-wide, so a report also
+contains the enrichment worker threads and any other request served
+meanwhile. Only one profile can be active in the process at a time.
+"""
+
+import io
+import os
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# First matching rule wins; matched against "<file>:<function>" of each profiled function
+CATEGORIES: List[Tuple[str, Tuple[str, ...]]] = [
+    ('json_parsing', ('json/decoder.py', 'json/scanner.py', 'json_stream.py', 'json_loads', 'orjson.loads', 'parse_asset',
+                      'cache_enriched_assets', "method 'json'")),
+    ('response_building', ('json/encoder.py', 'flask/json', 'jsonify', 'orjson.dumps', 'serialize_assets',
+                           'proxy_urls', 'werkzeug/wrappers', 'flask/wrappers')),
+    ('upstream_http', ('requests/', 'urllib3/', 'http/client.py', 'socket.py', 'ssl.py', "'_socket.socket'",
+                       "'_ssl._SSLSocket'")),
+    # The request thread blocked on enrichment worker threads. Up to Python 3.11 the
+    # workers are not profiled, so this stands in for their (mostly upstream HTTP)
+    # time; from 3.12 their own time is counted too, so this overlaps with it
+    ('waiting_on_workers', ('concurrent/futures', 'threading.py', "'acquire' of '_thread.lock'",
+                            "'acquire' of '_thread.RLock'")),
+    ('local_index', ('sqlite3', 'album_index.py', 'playlist.py')),
+]
+
+# Held while a profile runs; a second concurrent one is refused
+_profiling = threading.Lock()
+
+class ProfilerBusyError(Exception):
+    """Raised when another profile is already running in the process"""
+
+@dataclass
+class ProfileReport:
+    """Result of profiling one call"""
+    name: str
+    total_seconds: float
+    breakdown: Dict[str, float]
+    text: str
+
+    def summary(self, path: str = None) -> Dict[str, Any]:
+        """JSON-friendly summary, as added to a profiled response"""
+        return {
+            'name': self.name,
+            'total_seconds': round(self.total_seconds, 4),
+            'breakdown': {category: round(seconds, 4) for category, seconds in self.breakdown.items()},
+            'report_file': path
+        }
+
+def categorize(filename: str, function: str) -> str:
+    """Category of a profiled function"""
+    location = f"{filename.replace(os.sep, '/')}:{function}"
+    for category, patterns in CATEGORIES:
+        if any(pattern in location for pattern in patterns):
+            return category
+    return 'other'
+
+def profile_call(name: str, func: Callable, *args, **kwargs):
+    """Run func under cProfile; returns (result, ProfileReport).
+
+    Raises ProfilerBusyError, without calling func, while another profile (or
+    on Python 3.12+ any other profiling tool) is active.
+    """
+    if not _profiling.acquire(blocking=False):
+        raise ProfilerBusyError("Another request is being profiled")
+    try:
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12+: 'Another profiling tool is already active'
+            raise ProfilerBusyError(str(e)) from e
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            total = time.perf_counter() - started
+    finally:
+        _profiling.release()
+
+    stats = pstats.Stats(profiler)
+    breakdown = {category: 0.0 for category, _patterns in CATEGORIES}
+    breakdown['other'] = 0.0
+    # Self time only, so every second is counted in exactly one category
+    for (filename, _line, function), (_calls, _primitive, tottime, _cumtime, _callers) in stats.stats.items():
+        breakdown[categorize(filename, function)] += tottime
+
+    output = io.StringIO()
+    output.write(f"Profile of {name}: {total:.3f} s wall time\n\nBreakdown by self time:\n")
+    for category, seconds in sorted(breakdown.items(), key=lambda item: -item[1]):
+        output.write(f"  {category:<20} {seconds:8.3f} s\n")
+    output.write('\n')
+    stats.stream = output
+    stats.sort_stats('cumulative').print_stats(40)
+    stats.sort_stats('tottime').print_stats(20)
+
+    return result, ProfileReport(name=name, total_seconds=total, breakdown=breakdown, text=output.getvalue())
+
+def save_report(report: ProfileReport, directory: str, keep: int = 20) -> str:
+    """Write a report to directory, keeping only the newest reports; returns its path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{report.name}.txt")
+    with open(path, 'w') as f:
+        f.write(report.text)
+
+    reports = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.txt')),
+        key=os.path.getmtime
+    )
+    for old in reports[:-keep]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    logger.info(f"Saved profile of {report.name} ({report.total_seconds:.3f} s) to {path}")
+    return path
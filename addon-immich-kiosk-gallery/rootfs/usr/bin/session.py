@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Session - Shared slideshows whose current slide is owned by the server
+"""
+
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ('memories', 'random')
+
+class SessionFullError(Exception):
+    """Raised when all screen slots are taken"""
+
+class SessionNotFoundError(Exception):
+    """Raised when controlling a session no screen is watching"""
+
+@dataclass
+class SlideSession:
+    """State of one shared slideshow"""
+    name: str
+    collection: str = 'memories'
+    slides: List[Dict[str, Any]] = field(default_factory=list)
+    index: int = 0
+    # Cursor of the next page; None when the slides are the whole collection
+    cursor: Optional[str] = None
+    sequence: int = 0
+    next_change: float = 0.0
+    # monotonic() time the last screen left; None while watched
+    idle_since: Optional[float] = None
+    subscribers: List[queue.Queue] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+class SessionManager:
+    """Shared slideshows for screens in the same room.
+
+    Every session has one current slide, advanced by a background thread every
+    interval seconds while at least one screen is subscribed, or on request
+    (next/prev/collection switch from any screen). Each change is pushed to
+    all subscribed screens, so they stay in sync and ask for the same images,
+    which the proxy then fetches from Immich once.
+
+    Slides come from load_slides(session, collection, cursor), which returns
+    (slides, next_cursor); a None cursor means the slides are the complete
+    collection and are reloaded when the show wraps around. on_change is
+    called with (session, collection, upcoming slides) after every change.
+
+    Only screens create sessions, and only watched sessions can be
+    controlled. A session nobody has watched for idle_timeout seconds is
+    forgotten, and on_evict(session) is called to drop its state kept
+    elsewhere.
+    """
+
+    def __init__(self, load_slides: Callable[[str, str, Optional[str]], Tuple[List[Dict[str, Any]], Optional[str]]],
+                 on_change: Optional[Callable[[str, str, List[Dict[str, Any]]], None]] = None,
+                 on_evict: Optional[Callable[[str], None]] = None,
+                 interval: float = 8.0, max_screens: int = 8, upcoming: int = 3, max_loaded: int = 200,
+                 idle_timeout: float = 3600.0):
+        self.load_slides = load_slides
+        self.on_change = on_change
+        self.on_evict = on_evict
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.max_screens = max_screens
+        self.upcoming = upcoming
+        self.max_loaded = max_loaded
+        self._sessions: Dict[str, SlideSession] = {}
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='immich-sessions', daemon=True)
+        self._thread.start()
+
+    def subscribe(self, name: str) -> queue.Queue:
+        """Register a screen; returns the queue its slide events are put on"""
+        with self._condition:
+            screens = sum(len(session.subscribers) for session in self._sessions.values())
+            if self._stopped or screens >= self.max_screens:
+                raise SessionFullError(f"All {self.max_screens} session screens are in use")
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._sessions[name] = SlideSession(name=name)
+            subscription = queue.Queue(maxsize=16)
+            if not session.subscribers:
+                # Paused while nobody watched: resume from the current slide, or load slides now
+                session.next_change = time.monotonic() + self.interval if session.slides else 0.0
+            session.idle_since = None
+            session.subscribers.append(subscription)
+            if session.slides:
+                subscription.put_nowait(self._event(session))
+            self._condition.notify()
+        logger.info(f"Screen joined session '{name}' ({len(session.subscribers)} watching)")
+        return subscription
+
+    def unsubscribe(self, name: str, subscription: queue.Queue):
+        """Remove a screen from a session"""
+        with self._condition:
+            session = self._sessions.get(name)
+            if session is not None and subscription in session.subscribers:
+                session.subscribers.remove(subscription)
+                if not session.subscribers:
+                    session.idle_since = time.monotonic()
+                    self._condition.notify()
+                logger.info(f"Screen left session '{name}' ({len(session.subscribers)} watching)")
+
+    def control(self, name: str, action: str, collection: Optional[str] = None) -> Dict[str, Any]:
+        """Apply a next/prev/collection action from a screen; returns the new slide event"""
+        with self._condition:
+            session = self._sessions.get(name)
+            if session is None or not session.subscribers:
+                raise SessionNotFoundError(f"No screen is watching session '{name}'")
+
+        if action == 'next':
+            return self._advance(session, 1)
+        if action == 'prev':
+            return self._advance(session, -1)
+        if action == 'collection':
+            if collection not in COLLECTIONS:
+                raise ValueError(f"Unknown collection: {collection}")
+            return self._advance(session, 0, collection=collection)
+        raise ValueError(f"Unknown action: {action}")
+
+    def stop(self):
+        """Stop the ticker and end every open event stream"""
+        with self._condition:
+            self._stopped = True
+            for session in self._sessions.values():
+                for subscription in session.subscribers:
+                    self._put(subscription, None)
+            self._condition.notify()
+        self._thread.join(timeout=5)
+
+    def _event(self, session: SlideSession) -> Dict[str, Any]:
+        """Slide event of a session's current state. Caller holds the session lock or the condition."""
+        slides = session.slides
+        return {
+            'session': session.name,
+            'collection': session.collection,
+            'sequence': session.sequence,
+            'index': session.index,
+            'slide': slides[session.index] if slides else None,
+            'upcoming': slides[session.index + 1:session.index + 1 + self.upcoming],
+            'interval': self.interval
+        }
+
+    @staticmethod
+    def _put(subscription: queue.Queue, event):
+        """Queue an event for a screen, dropping its oldest one if it is not keeping up"""
+        while True:
+            try:
+                subscription.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    subscription.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _needs_slides(self, session: SlideSession, target: int) -> bool:
+        if not session.slides:
+            return True
+        if session.cursor is None:
+            return target >= len(session.slides)
+        return target >= len(session.slides) - self.upcoming
+
+    def _advance(self, session: SlideSession, step: int, collection: Optional[str] = None) -> Dict[str, Any]:
+        """Move a session by step slides (or to the start of another collection) and broadcast it"""
+        with session.lock:
+            if collection is not None and collection != session.collection:
+                session.collection = collection
+                session.slides = []
+                session.cursor = None
+            target = session.index + step if session.slides else 0
+
+            if self._needs_slides(session, target):
+                paged = session.slides and session.cursor is not None
+                try:
+                    slides, cursor = self.load_slides(session.name, session.collection,
+                                                      session.cursor if paged else None)
+                except Exception as e:
+                    logger.error(f"Failed to load slides for session '{session.name}': {e}")
+                    slides, cursor = [], session.cursor
+                if paged:
+                    session.slides = session.slides + slides
+                    # Forget slides that were already shown to bound memory
+                    excess = len(session.slides) - self.max_loaded
+                    if excess > 0 and target >= excess:
+                        session.slides = session.slides[excess:]
+                        target -= excess
+                elif slides or not session.slides:
+                    session.slides = slides
+                    target = 0
+                session.cursor = cursor
+
+            if session.slides:
+                if session.cursor is None:
+                    target %= len(session.slides)
+                else:
+                    target = min(max(target, 0), len(session.slides) - 1)
+            session.index = target if session.slides else 0
+            session.sequence += 1
+            upcoming = session.slides[session.index + 1:session.index + 1 + self.upcoming]
+
+            with self._condition:
+                session.next_change = time.monotonic() + self.interval
+                event = self._event(session)
+                for subscription in session.subscribers:
+                    self._put(subscription, event)
+                self._condition.notify()
+
+        if self.on_change is not None and upcoming:
+            try:
+                self.on_change(session.name, session.collection, upcoming)
+            except Exception as e:
+                logger.warning(f"Session change hook failed for '{session.name}': {e}")
+        return event
+
+    def _evict_idle(self, now: float) -> List[str]:
+        """Forget sessions nobody watched for idle_timeout. Caller holds the condition."""
+        evicted = [
+            name for name, session in self._sessions.items()
+            if not session.subscribers and session.idle_since is not None
+            and now - session.idle_since >= self.idle_timeout
+        ]
+        for name in evicted:
+            del self._sessions[name]
+            logger.info(f"Forgot session '{name}' after {self.idle_timeout:.0f}s without screens")
+        return evicted
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                evicted = self._evict_idle(now)
+                active = [session for session in self._sessions.values() if session.subscribers]
+                due = [session for session in active if session.next_change <= now]
+                if not due and not evicted:
+                    deadlines = [session.next_change for session in active] + [
+                        session.idle_since + self.idle_timeout
+                        for session in self._sessions.values()
+                        if not session.subscribers and session.idle_since is not None
+                    ]
+                    self._condition.wait(min(deadlines) - now if deadlines else None)
+                    continue
+                for session in due:
+                    # Not picked up again while it is being advanced
+                    session.next_change = now + self.interval
+
+            for name in evicted:
+                if self.on_evict is not None:
+                    try:
+                        self.on_evict(name)
+                    except Exception as e:
+                        logger.warning(f"Session eviction hook failed for '{name}': {e}")
+            for session in due:
+                # The first tick of a (re)started session only publishes slides, if it has none yet
+                self._advance(session, 1 if session.slides else 0)
+
+    def stats(self):
+        """Return session statistics"""
+        with self._condition:
+            return {
+                'max_screens': self.max_screens,
+                'interval': self.interval,
+                'sessions': {
+                    name: {
+                        'collection': session.collection,
+                        'screens': len(session.subscribers),
+                        'index': session.index,
+                        'loaded': len(session.slides)
+                    }
+                    for name, session in self._sessions.items()
+                }
+            }
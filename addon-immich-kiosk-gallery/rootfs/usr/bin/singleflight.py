@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Single Flight - Coalescing of concurrent identical calls into one
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+class _Call:
+    """One in-flight call and its outcome"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs at most one call per key at a time.
+
+    Callers that ask for a key while a call for it is in flight wait for that
+    call and receive its result (or its exception) instead of starting their
+    own. Nothing is cached: once a call finishes, the next caller starts anew.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run func for key, or join the call already in flight.
+
+        Returns (result, shared), where shared tells whether the result came
+        from another caller's call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Number of keys with a call in progress"""
+        with self._lock:
+            return len(self._calls)
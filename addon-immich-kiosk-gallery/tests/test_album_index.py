@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Album index tests - Paged album refresh against benchmarks/fake_immich
+
+Run with: python3 -m pytest tests  (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ADDON_DIR, 'rootfs', 'usr', 'bin'))
+sys.path.insert(0, os.path.join(ADDON_DIR, 'benchmarks'))
+
+from fake_immich import make_server
+from immich_api_client import ImmichAPIClient
+from album_index import AlbumIndex
+import immich_api_client
+
+class AlbumIndexTest(unittest.TestCase):
+
+    legacy = False
+
+    def setUp(self):
+        self.server = make_server(port=0, albums=1, album_size=50, latency=0, legacy=self.legacy)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.client = ImmichAPIClient(f"http://{host}:{port}", 'test-key', retries=0)
+        self.data_dir = tempfile.mkdtemp()
+        self.index = AlbumIndex(os.path.join(self.data_dir, 'album_index.db'), self.client)
+        # Small pages, so the album spans several of them
+        patcher = mock.patch.object(immich_api_client, 'ALBUM_PAGE_SIZE', 7)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.client.executor.shutdown(wait=False)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir)
+
+    def expected_ids(self):
+        album = self.server.fake.album('album-0')
+        return sorted(
+            asset_id for asset_id in album['assetIds']
+            if self.server.fake.assets[asset_id]['type'] == 'IMAGE' and not self.server.fake.assets[asset_id]['isArchived']
+        )
+
+    def test_album_is_indexed_page_by_page(self):
+        pages = list(self.client.iter_album_asset_pages('album-0'))
+        self.assertGreater(len(pages), 1)
+        self.assertTrue(all(len(page) <= 7 for page in pages))
+
+        self.index.sync(['Album 0'], force=True)
+        self.assertEqual(sorted(self.index.get_pool_ids(['Album 0'])), self.expected_ids())
+
+    def test_failure_midway_keeps_the_old_index(self):
+        self.index.sync(['Album 0'], force=True)
+        before = sorted(self.index.get_pool_ids(['Album 0']))
+
+        def broken_pages(album_id):
+            yield next(iter(self.client.iter_album_asset_pages(album_id)))
+            raise RuntimeError('connection lost')
+
+        album = self.client.find_albums_by_name(['Album 0'])[0]
+        with mock.patch.object(self.client, 'iter_album_asset_pages', broken_pages):
+            self.index._refresh_album(album)
+
+        self.assertEqual(sorted(self.index.get_pool_ids(['Album 0'])), before)
+
+class LegacyAlbumIndexTest(AlbumIndexTest):
+    """The streamed album response is paged the same way"""
+
+    legacy = True
+
+if __name__ == '__main__':
+    unittest.main()
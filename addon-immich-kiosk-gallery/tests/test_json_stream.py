@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+JSON stream tests - Incremental array decoding, split into chunks at every possible boundary
+
+Run with: python3 -m pytest tests  (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import json
+import random
+import unittest
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ADDON_DIR, 'rootfs', 'usr', 'bin'))
+
+from json_stream import iter_array
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def every_split(data: bytes):
+    """The data cut in two at every byte offset"""
+    for cut in range(len(data) + 1):
+        yield [data[:cut], data[cut:]]
+
+class IterArrayTest(unittest.TestCase):
+
+    def assertDecodes(self, value, key=None, document=None):
+        """Decoding the document in any two pieces and in small chunks yields the array items"""
+        data = json.dumps(document if document is not None else value, ensure_ascii=False).encode('utf-8')
+        for chunks in every_split(data):
+            self.assertEqual(list(iter_array(chunks, key)), value, chunks)
+        for size in (1, 2, 3, 7):
+            self.assertEqual(list(iter_array(chunked(data, size), key)), value, size)
+
+    def test_numbers_cut_at_a_chunk_boundary(self):
+        self.assertDecodes([1.5, -2, 3e10, 0.25e-3, 12345678901234567890, -0.0])
+        self.assertDecodes([7])
+
+    def test_literals_and_strings(self):
+        self.assertDecodes([True, False, None, '', 'a,b]', 'quote " and \\ slash'])
+
+    def test_multibyte_utf8_split_inside_a_character(self):
+        self.assertDecodes(['Košice', 'Žilina 😀', {'city': 'Bratislava'}])
+
+    def test_nested_values(self):
+        self.assertDecodes([{'a': [1, {'b': None}]}, [], {}, [[2.5]]])
+
+    def test_empty_array(self):
+        self.assertDecodes([])
+
+    def test_array_under_a_key(self):
+        document = {'id': 'album', 'count': 2.5, 'nested': {'assets': [0]}, 'assets': [{'id': 1}, {'id': 2}], 'tail': 1}
+        self.assertDecodes([{'id': 1}, {'id': 2}], key='assets', document=document)
+
+    def test_missing_key_yields_nothing(self):
+        self.assertDecodes([], key='assets', document={'id': 'album', 'other': [1, 2]})
+
+    def test_whitespace_between_tokens(self):
+        data = b' [ 1 ,\n 2.5 ,\t{ "a" : 3 } ] '
+        for size in (1, 2, 5):
+            self.assertEqual(list(iter_array(chunked(data, size))), [1, 2.5, {'a': 3}])
+
+    def test_malformed_input_raises_value_error(self):
+        for data in (b'{"assets": 1}', b'[1 2]', b'[1,', b'', b'[{"a": }]', b'{"assets" [1]}'):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                list(iter_array(chunked(data, 1), 'assets' if data.startswith(b'{') else None))
+
+    def test_random_documents_in_random_chunks(self):
+        rng = random.Random(4)
+
+        def value(depth=0):
+            roll = rng.random()
+            if depth > 2 or roll < 0.5:
+                return rng.choice([
+                    rng.randint(-10 ** 6, 10 ** 6), rng.uniform(-1e6, 1e6), rng.uniform(-1, 1) * 10 ** rng.randint(-30, 30),
+                    True, False, None, '', 'sé"\\x😀'
+                ])
+            if roll < 0.75:
+                return [value(depth + 1) for _ in range(rng.randint(0, 4))]
+            return {f"k{i}": value(depth + 1) for i in range(rng.randint(0, 4))}
+
+        for _ in range(2000):
+            items = [value() for _ in range(rng.randint(0, 8))]
+            data = json.dumps(items, ensure_ascii=False, indent=rng.choice([None, 1])).encode('utf-8')
+            self.assertEqual(list(iter_array(chunked(data, rng.randint(1, 7)))), items)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Playlist tests - No-repeat kiosk playlists over an album index synced from benchmarks/fake_immich
+
+Run with: python3 -m pytest tests  (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ADDON_DIR, 'rootfs', 'usr', 'bin'))
+sys.path.insert(0, os.path.join(ADDON_DIR, 'benchmarks'))
+
+from fake_immich import make_server
+from immich_api_client import ImmichAPIClient
+from album_index import AlbumIndex
+import playlist
+from playlist import PlaylistStore
+
+ALBUMS = ['Album 0', 'Album 1']
+
+class PlaylistTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = make_server(port=0, albums=2, album_size=20, latency=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.client = ImmichAPIClient(f"http://{host}:{port}", 'test-key', retries=0)
+        self.data_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.data_dir, 'album_index.db')
+        self.index = AlbumIndex(self.db_path, self.client)
+        self.index.sync(ALBUMS, force=True)
+
+    def tearDown(self):
+        self.client.executor.shutdown(wait=False)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir)
+
+    @staticmethod
+    def ids(page):
+        return [asset.id for asset in page.assets]
+
+    def test_pages_without_cursor_resume_instead_of_repeating(self):
+        store = PlaylistStore(self.db_path, self.index)
+        first = store.get_page('kiosk', ALBUMS, limit=5)
+        second = store.get_page('kiosk', ALBUMS, limit=5)
+
+        self.assertEqual(second.position, 5)
+        self.assertFalse(set(self.ids(first)) & set(self.ids(second)))
+
+    def test_position_survives_a_restart(self):
+        store = PlaylistStore(self.db_path, self.index)
+        first = store.get_page('kiosk', ALBUMS, limit=5)
+
+        restarted = PlaylistStore(self.db_path, self.index)
+        resumed = restarted.get_page('kiosk', ALBUMS, limit=5)
+
+        self.assertEqual(resumed.generation, first.generation)
+        self.assertEqual(resumed.position, 5)
+        self.assertFalse(set(self.ids(first)) & set(self.ids(resumed)))
+
+    def test_whole_pool_is_shown_once_per_round(self):
+        store = PlaylistStore(self.db_path, self.index)
+        seen = []
+        page = store.get_page('kiosk', ALBUMS, limit=7)
+        while page.generation == 1:
+            seen.extend(self.ids(page))
+            page = store.get_page('kiosk', ALBUMS, cursor=page.next_cursor, limit=7)
+
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(sorted(seen), sorted(self.index.get_pool_ids(ALBUMS)))
+
+    def test_unused_playlists_are_swept(self):
+        store = PlaylistStore(self.db_path, self.index, max_idle=60)
+        store.get_page('old-kiosk', ALBUMS, limit=5)
+        with store._conn:
+            store._conn.execute("UPDATE playlists SET used_at = ? WHERE kiosk_id = 'old-kiosk'", (time.time() - 120,))
+        store._last_sweep = time.time() - playlist.SWEEP_INTERVAL
+
+        store.get_page('new-kiosk', ALBUMS, limit=5)
+
+        kiosks = {row[0] for row in store._conn.execute('SELECT DISTINCT kiosk_id FROM playlist_items')}
+        self.assertEqual(kiosks, {'new-kiosk'})
+
+if __name__ == '__main__':
+    unittest.main()
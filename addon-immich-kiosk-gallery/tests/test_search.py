@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Search tests - Album sync and random photos through Immich's search API, against benchmarks/fake_immich
+
+Run with: python3 -m pytest tests  (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import dataclasses
+import threading
+import unittest
+from unittest import mock
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ADDON_DIR, 'rootfs', 'usr', 'bin'))
+sys.path.insert(0, os.path.join(ADDON_DIR, 'benchmarks'))
+
+from fake_immich import make_server
+from immich_api_client import ImmichAPIClient
+
+class FakeImmichTestCase(unittest.TestCase):
+    """Starts a fake Immich on a free port and a client pointed at it"""
+
+    legacy = False
+
+    def setUp(self):
+        self.server = make_server(port=0, albums=2, album_size=100, latency=0, legacy=self.legacy)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address
+        self.client = ImmichAPIClient(f"http://{host}:{port}", 'test-key', retries=0)
+
+    def tearDown(self):
+        self.client.executor.shutdown(wait=False)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        return self.server.fake.stats()
+
+class SearchTest(FakeImmichTestCase):
+
+    def test_album_sync_uses_metadata_search_and_caches_details(self):
+        assets = self.client.get_album_assets('album-0')
+
+        self.assertTrue(assets)
+        self.assertTrue(self.client.search_supported)
+        self.assertEqual(self.stats().get('search/metadata'), 1)
+        for asset in assets:
+            self.assertEqual(asset.type.upper(), 'IMAGE')
+            self.assertFalse(asset.is_archived)
+            cached = self.client.asset_info_cache.peek(asset.id)
+            self.assertIsNotNone(cached, f"{asset.id} was not cached as asset details")
+            self.assertTrue(cached.city)
+
+    def test_random_assets_are_sampled_per_album_by_size(self):
+        albums = self.client.find_albums_by_name(['Album 0', 'Album 1'])
+        self.assertEqual(len(albums), 2)
+        # Album 0 claims three times the assets of album 1, so it gets three quarters of the count
+        sizes = {'album-0': 300, 'album-1': 100}
+        albums = [dataclasses.replace(album, asset_count=sizes[album.id]) for album in albums]
+
+        with mock.patch.object(self.client, '_search', wraps=self.client._search) as search:
+            assets = self.client.search_random_assets(albums, count=20)
+
+        requested = {call.args[1]['albumIds'][0]: call.args[1]['size'] for call in search.call_args_list}
+        self.assertEqual(requested, {'album-0': 15, 'album-1': 5})
+        for call in search.call_args_list:
+            self.assertEqual(call.args[0], 'random')
+            self.assertEqual(len(call.args[1]['albumIds']), 1)
+            self.assertTrue(call.args[1]['withExif'])
+
+        self.assertIsNotNone(assets)
+        self.assertLessEqual(len(assets), 20)
+        self.assertEqual(len({asset.id for asset in assets}), len(assets))
+        album_0 = set(self.server.fake.album('album-0')['assetIds'])
+        self.assertLessEqual(sum(asset.id in album_0 for asset in assets), 15)
+        self.assertLessEqual(sum(asset.id not in album_0 for asset in assets), 5)
+
+    def test_random_assets_without_album_assets_fall_back(self):
+        self.assertIsNone(self.client.search_random_assets([], count=20))
+        albums = [dataclasses.replace(album, asset_count=0)
+                  for album in self.client.find_albums_by_name(['Album 0'])]
+        self.assertIsNone(self.client.search_random_assets(albums, count=20))
+
+class LegacySearchTest(FakeImmichTestCase):
+    """Servers without the search API answer 404"""
+
+    legacy = True
+
+    def test_album_sync_falls_back_to_album_response(self):
+        assets = self.client.get_album_assets('album-0')
+
+        self.assertTrue(assets)
+        self.assertIs(self.client.search_supported, False)
+        album_0 = set(self.server.fake.album('album-0')['assetIds'])
+        self.assertTrue(all(asset.id in album_0 for asset in assets))
+        self.assertTrue(all(asset.type.upper() == 'IMAGE' and not asset.is_archived for asset in assets))
+
+    def test_unsupported_search_is_not_retried(self):
+        albums = self.client.find_albums_by_name(['Album 0', 'Album 1'])
+
+        self.assertIsNone(self.client.search_random_assets(albums, count=20))
+        self.assertIsNone(self.client.search_random_assets(albums, count=20))
+        self.client.get_album_assets('album-1')
+
+        stats = self.stats()
+        self.assertEqual(stats.get('not found'), 1, stats)
+        self.assertNotIn('search/random', stats)
+        self.assertNotIn('search/metadata', stats)
+
+if __name__ == '__main__':
+    unittest.main()